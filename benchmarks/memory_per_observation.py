@@ -0,0 +1,112 @@
+"""
+Memory per observation for parsed nowcast data.
+
+Builds a synthetic 360 step nowcast payload and measures, with tracemalloc,
+how many bytes each observation costs in the different representations.
+Every representation is decoded with the same json backend, the fastest one
+installed unless --json-backend says otherwise:
+
+    python benchmarks/memory_per_observation.py [--json-backend json]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from climacell_api import climacell_response, json_backend
+from climacell_api.climacell_response import ClimacellResponse, ObservationData
+from climacell_api.transport import build_response
+from payloads import FIELDS, nowcast_payload
+
+STEPS = 360
+
+
+def response(payload, fields=FIELDS):
+    return ClimacellResponse(
+            build_response(200, {'Content-Type': 'application/json'},
+                           payload, 'https://api.climacell.co/v3/'),
+            fields=fields)
+
+
+def measure(build):
+    """Bytes allocated by build() and still alive, per observation."""
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = len(result)
+    del result
+    return (after - before) / count
+
+
+class _DictMeasurement:
+
+    def __init__(self, value, units, observation_time=None):
+        self.value = value
+        self.units = units
+        self.observation_time = observation_time
+
+
+class _DictObservationData:
+    """
+    ObservationData backed by an instance __dict__ instead of __slots__, with
+    the same code so only the storage of the attributes differs.
+    """
+
+    __init__ = ObservationData.__init__
+    lat = ObservationData.lat
+    lon = ObservationData.lon
+    observation_time = ObservationData.observation_time
+    measurements = ObservationData.measurements
+    drop_raw_json = ObservationData.drop_raw_json
+    _parse_measurements = ObservationData._parse_measurements
+
+
+def parsed(data):
+    for observation in data:
+        observation.observation_time
+        observation.measurements
+    return data
+
+
+def run(steps=STEPS):
+    """
+    :returns: Bytes per observation for each representation
+    :rtype: dict
+    """
+
+    payload = nowcast_payload(steps)
+    fields = FIELDS
+
+    def unslotted(keep_raw_json=True):
+        original = climacell_response.Measurement
+        climacell_response.Measurement = _DictMeasurement
+        try:
+            data = parsed([_DictObservationData(o, fields)
+                           for o in response(payload).json()])
+            if not keep_raw_json:
+                for observation in data:
+                    observation.drop_raw_json()
+            return data
+        finally:
+            climacell_response.Measurement = original
+
+    return {
+        'raw_json': measure(lambda: response(payload).json()),
+        'unslotted_parsed': measure(unslotted),
+        'slotted_parsed': measure(lambda: parsed(response(payload).data())),
+        'unslotted_without_raw_json': measure(lambda: unslotted(False)),
+        'slotted_without_raw_json': measure(
+            lambda: response(payload).data(keep_raw_json=False)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--json-backend', choices=json_backend.BACKENDS)
+    json_backend.use(parser.parse_args().json_backend)
+    print('json backend: {}'.format(json_backend.name))
+    for name, size in run().items():
+        print('{:<26} {:>8.0f} bytes/observation'.format(name, size))
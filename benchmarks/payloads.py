@@ -0,0 +1,58 @@
+"""
+Response bodies used by the benchmarks: recorded ones from the test
+cassettes and synthetic ones for sizes the cassettes do not cover.
+"""
+import gzip
+import json
+import os
+
+import yaml
+
+CASSETTES = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                         'vcr_cassettes')
+
+FIELDS = ['temp', 'feels_like', 'humidity', 'wind_speed', 'wind_gust',
+          'precipitation', 'precipitation_type', 'cloud_cover']
+
+
+def cassette_body(name):
+    """Decoded body of the first response recorded in a cassette."""
+
+    with open(os.path.join(CASSETTES, name)) as f:
+        response = yaml.safe_load(f)['interactions'][0]['response']
+    body = response['body']['string']
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if 'gzip' in response['headers'].get('Content-Encoding', []):
+        body = gzip.decompress(body)
+    return body
+
+
+def nowcast_payload(steps=360, fields=FIELDS):
+    """A nowcast body with one observation per minute."""
+
+    observations = []
+    for minute in range(steps):
+        observation = {
+            'lat': 40.0,
+            'lon': -89.5,
+            'observation_time': {
+                'value': '2020-06-22T{:02d}:{:02d}:00.000Z'.format(
+                    minute // 60, minute % 60)},
+        }
+        for i, field in enumerate(fields):
+            if field == 'precipitation_type':
+                observation[field] = {'value': 'none'}
+            else:
+                observation[field] = {'value': minute * 0.1 + i,
+                                      'units': 'C'}
+        observations.append(observation)
+    return json.dumps(observations).encode('utf-8')
+
+
+def realtime_payload():
+    return cassette_body('realtime-lat12-lon13.yml')
+
+
+def daily_payload():
+    return cassette_body('forecast-daily-no-end-time.yml')
@@ -0,0 +1,250 @@
+"""
+Benchmark suite for client overhead, throughput and response parsing.
+
+Runs against a local stub server serving bodies recorded in the test
+cassettes, so results do not depend on the network or an api key, and
+writes machine readable json:
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare baseline.json --threshold 0.2
+
+With --compare the run exits with status 1 when any result is worse than the
+baseline by more than threshold (a fraction, 0.2 is 20%).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import requests
+
+import memory_per_observation
+from climacell_api.client import ClimacellApiClient
+from climacell_api.climacell_response import ClimacellResponse
+from climacell_api.parallel import ProcessPoolParser, parse_columns
+from climacell_api.transport import build_response
+from payloads import (FIELDS, daily_payload, nowcast_payload,
+                      realtime_payload)
+from stub_server import StubServer
+
+REALTIME_URL = '/v3/weather/realtime'
+REALTIME_FIELDS = ['temp', 'wind_gust']
+DAILY_FIELDS = ['temp', 'precipitation', 'sunrise']
+CONCURRENCY = (1, 4, 16, 64)
+
+
+def _result(value, unit, better='lower'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def _per_call(fn, number, repeat):
+    # Best of repeat runs, in microseconds per call
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def client_overhead(number, repeat):
+    """
+    Microseconds per realtime() call compared to a bare session.get() of
+    the same url, both over a keep-alive connection.
+    """
+
+    with StubServer({REALTIME_URL: realtime_payload()}) as base_url:
+        client = ClimacellApiClient('benchmark')
+        client.BASE_URL = base_url + '/v3'
+        session = requests.Session()
+        params = {'lat': 12, 'lon': 13, 'unit_system': 'si',
+                  'fields': ','.join(REALTIME_FIELDS), 'apikey': 'benchmark'}
+
+        def raw():
+            session.get(base_url + REALTIME_URL, params=params).content
+
+        def api():
+            client.realtime(12, 13, REALTIME_FIELDS).content
+
+        raw_us = _per_call(raw, number, repeat)
+        client_us = _per_call(api, number, repeat)
+        client.close()
+        session.close()
+
+    return {
+        'overhead.raw_get': _result(raw_us, 'us/call'),
+        'overhead.client_realtime': _result(client_us, 'us/call'),
+        'overhead.client_extra': _result(client_us - raw_us, 'us/call'),
+    }
+
+
+def throughput(requests_per_level, latency):
+    """Requests per second of realtime_many() at several concurrencies."""
+
+    results = {}
+    with StubServer({REALTIME_URL: realtime_payload()},
+                    latency=latency) as base_url:
+        for workers in CONCURRENCY:
+            client = ClimacellApiClient('benchmark', pool_maxsize=workers)
+            client.BASE_URL = base_url + '/v3'
+            locations = [(i, i) for i in range(requests_per_level)]
+            start = time.perf_counter()
+            for result in client.realtime_many(locations, REALTIME_FIELDS,
+                                               max_workers=workers):
+                result.data()
+            elapsed = time.perf_counter() - start
+            client.close()
+            results['throughput.concurrency_{}'.format(workers)] = _result(
+                    requests_per_level / elapsed, 'requests/s', 'higher')
+    return results
+
+
+def parsing(number, repeat):
+    """Microseconds to parse each payload with data(), to_columns() and
+    iter_data()."""
+
+    payloads = {
+        'realtime': (realtime_payload(), REALTIME_FIELDS, 'realtime'),
+        'nowcast_360': (nowcast_payload(360), FIELDS, 'forecast'),
+        'daily_15': (daily_payload(), DAILY_FIELDS, 'daily_forecast'),
+    }
+
+    results = {}
+    for name, (payload, fields, response_type) in payloads.items():
+        def response():
+            # A new response each time so no decoded json is reused
+            return ClimacellResponse(
+                    build_response(200, {'Content-Type': 'application/json'},
+                                   payload, 'http://localhost/'),
+                    fields, response_type)
+
+        def data():
+            parsed = response().data()
+            for observation in (parsed if isinstance(parsed, list)
+                                else [parsed]):
+                observation.observation_time
+                observation.measurements
+
+        def iter_data():
+            for observation in response().iter_data():
+                observation.measurements
+
+        for method, fn in (('data', data),
+                           ('to_columns', lambda: response().to_columns()),
+                           ('iter_data', iter_data)):
+            results['parse.{}.{}'.format(name, method)] = _result(
+                    _per_call(fn, number, repeat), 'us/call')
+    return results
+
+
+def pool_parsing(count):
+    """Microseconds per 360 step nowcast parsed by ProcessPoolParser with
+    one worker per CPU, against to_columns() in this process."""
+
+    payload = nowcast_payload(360)
+    responses = [ClimacellResponse(
+            build_response(200, {'Content-Type': 'application/json'},
+                           payload, 'http://localhost/'), FIELDS)
+                 for _ in range(count)]
+
+    start = time.perf_counter()
+    for response in responses:
+        parse_columns(response.content, 200, FIELDS)
+    serial = time.perf_counter() - start
+
+    with ProcessPoolParser() as parser:
+        # Start the workers before timing
+        list(parser.map(responses[:1]))
+        start = time.perf_counter()
+        list(parser.map(responses, chunksize=4))
+        pooled = time.perf_counter() - start
+
+    return {
+        'parse.serial.nowcast_360': _result(serial / count * 1e6,
+                                            'us/response'),
+        'parse.pool.nowcast_360': _result(pooled / count * 1e6,
+                                          'us/response'),
+    }
+
+
+def memory():
+    """Bytes per nowcast observation in each representation."""
+
+    return {'memory.' + name: _result(size, 'bytes/observation')
+            for name, size in memory_per_observation.run().items()}
+
+
+def run(quick=False):
+    number, repeat = (20, 3) if quick else (200, 5)
+    results = {}
+    results.update(client_overhead(number, repeat))
+    results.update(throughput(64 if quick else 512, latency=0.005))
+    results.update(parsing(number // 4 or 1, repeat))
+    results.update(pool_parsing(16 if quick else 128))
+    results.update(memory())
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'requests': requests.__version__,
+            'cpus': os.cpu_count(),
+            'quick': quick,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+
+def regressions(current, baseline, threshold):
+    """
+    Results that are worse than the baseline by more than threshold.
+
+    :returns: (name, baseline value, current value) for each regression
+    :rtype: list
+    """
+
+    found = []
+    for name, old in sorted(baseline['results'].items()):
+        new = current['results'].get(name)
+        if new is None or not old['value']:
+            continue
+        change = (new['value'] - old['value']) / abs(old['value'])
+        if old['better'] == 'higher':
+            change = -change
+        if change > threshold:
+            found.append((name, old['value'], new['value']))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help='write the json results here '
+                        'instead of to stdout')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='json results of an earlier run to compare to')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown as a fraction (default 0.2)')
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer iterations, for a smoke test')
+    args = parser.parse_args(argv)
+
+    current = run(quick=args.quick)
+    output = json.dumps(current, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        found = regressions(current, baseline, args.threshold)
+        for name, old, new in found:
+            print('regression: {} {:.1f} -> {:.1f}'.format(name, old, new),
+                  file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
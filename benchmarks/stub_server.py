@@ -0,0 +1,70 @@
+"""
+Local keep-alive HTTP server answering every endpoint with a fixed body, so
+the benchmarks measure the client rather than the network or the API. It
+runs in its own process so it does not compete with the client for the GIL.
+"""
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = self.server.bodies.get(urlsplit(self.path).path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        status = 200 if body is not None else 404
+        body = body if body is not None else b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(bodies, latency, ports):
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.bodies = bodies
+    server.latency = latency
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+class StubServer:
+    """
+    Serves bodies[path] for GET requests to path, after waiting latency
+    seconds to stand in for the round trip to the API.
+
+        with StubServer({'/v3/weather/realtime': body}) as base_url:
+            client.BASE_URL = base_url + '/v3'
+    """
+
+    def __init__(self, bodies, latency=0):
+        self.bodies = bodies
+        self.latency = latency
+        self._process = None
+
+    def __enter__(self):
+        ports = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+                target=_serve, args=(self.bodies, self.latency, ports))
+        self._process.daemon = True
+        self._process.start()
+        return 'http://127.0.0.1:{}'.format(ports.get(timeout=10))
+
+    def __exit__(self, *exc_info):
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,381 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from climacell_api.cache import MemoryCache
+from climacell_api.client import (ClimacellApiClient,
+                                  _log_failed_revalidation, _retry_delay,
+                                  stitch_responses)
+from climacell_api.retry import CircuitOpenError
+from climacell_api.singleflight import AsyncSingleFlight
+from climacell_api.transport import build_response
+
+
+class AsyncClimacellApiClient(ClimacellApiClient):
+    """
+    asyncio version of ClimacellApiClient backed by aiohttp.
+
+    Every endpoint method takes the same arguments as on ClimacellApiClient
+    but returns a coroutine that resolves to a ClimacellResponse, so data()
+    gives back the same ObservationData objects. At most max_concurrency
+    requests are in flight at once, the rest wait on a semaphore.
+
+    Requires aiohttp: pip install climacell-python[async]
+    """
+
+    _flight_class = AsyncSingleFlight
+
+    def __init__(self, key, session=None, max_concurrency=100,
+                 pool_maxsize=100, keep_alive=True, **options):
+        """
+        Takes the options of ClimacellApiClient, e.g. cache, retry or
+        merge_fields, except stream and its other connection pool options.
+
+        :param string key: ClimaCell API key
+        :param aiohttp.ClientSession session: Optional session to send
+        requests through. When given the caller owns it
+        :param int max_concurrency: Maximum number of requests in flight
+        :param int pool_maxsize: Maximum connections kept open per host
+        :param bool keep_alive: Reuse connections between requests
+        """
+
+        for name in ('stream', 'pool_connections', 'pool_block'):
+            if name in options:
+                raise TypeError("AsyncClimacellApiClient got an unexpected "
+                                "keyword argument '{}'".format(name))
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._pool = {"requests": 0, "misses": 0}
+        self._refreshing_tasks = set()
+        super().__init__(key, session=session, pool_maxsize=pool_maxsize,
+                         keep_alive=keep_alive, **options)
+        # File and SQLite backed caches are read and written in the default
+        # executor so they do not block the event loop
+        self._blocking_cache = self.store is not None or not (
+                self.cache is None or isinstance(self.cache, MemoryCache))
+
+    def _init_session(self, session, pool_connections, pool_maxsize,
+                      pool_block, keep_alive):
+        # The aiohttp session is created on first use, see _get_session
+        self.session = session
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncClimacellApiClient")
+
+    async def close(self):
+        """
+        Close pooled connections held by the client. Injected sessions are
+        left open for their owner to close. Background revalidations still
+        running are cancelled.
+        """
+
+        for task in list(self._revalidating.values()):
+            task.cancel()
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def pool_stats(self):
+        """
+        Connection pool usage of the client's session. New connections are
+        counted with an aiohttp trace config, so hits and misses are None
+        for an injected session.
+
+        :returns: Dictionary with 'requests', 'hits' and 'misses' counts
+        :rtype: dict
+        """
+
+        num_requests = self._pool["requests"]
+        if not self._owns_session:
+            return {"requests": num_requests, "hits": None, "misses": None}
+        misses = self._pool["misses"]
+        return {
+            "requests": num_requests,
+            "hits": max(num_requests - misses, 0),
+            "misses": misses,
+        }
+
+    @contextmanager
+    def refreshing(self):
+        """
+        Context manager within which requests awaited from the current task
+        skip cache reads, so they go upstream and refresh the cache even
+        when it holds a fresh response. Tasks started within it are not
+        covered.
+        """
+
+        task = _current_task()
+        if task is None:
+            raise RuntimeError("refreshing() must be used within a task")
+        added = task not in self._refreshing_tasks
+        self._refreshing_tasks.add(task)
+        try:
+            yield self
+        finally:
+            if added:
+                self._refreshing_tasks.discard(task)
+
+    def _get_session(self):
+        if self.session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError(
+                        "AsyncClimacellApiClient requires aiohttp, install it "
+                        "with: pip install climacell-python[async]")
+            connector = aiohttp.TCPConnector(
+                    limit_per_host=self.pool_maxsize,
+                    force_close=not self.keep_alive)
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._connection_created)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 trace_configs=[trace])
+        return self.session
+
+    async def _connection_created(self, session, context, params):
+        self._pool["misses"] += 1
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the loop the client is used from
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _fetch_many(self, endpoint, locations, max_workers, **kwargs):
+        # Yields awaitables in completion order, like asyncio.as_completed.
+        # Only max_workers locations are pulled from the iterable at a time
+        # and each result makes room for the next one, so await every result
+        # before asking for the next. Must be iterated in a running loop.
+        locations = iter(locations)
+        pending = {}
+        # Awaitables handed out that have not taken their result yet
+        claimed = 0
+
+        def submit_next():
+            for lat, lon in locations:
+                task = asyncio.ensure_future(endpoint(lat, lon, **kwargs))
+                pending[task] = (lat, lon)
+                return
+
+        async def next_result():
+            nonlocal claimed
+            done = [task for task in pending if task.done()]
+            while not done:
+                await asyncio.wait(pending,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                done = [task for task in pending if task.done()]
+            task = done[0]
+            location = pending.pop(task)
+            claimed -= 1
+            submit_next()
+            return self._location_result(location, task)
+
+        for _ in range(max_workers):
+            submit_next()
+        while len(pending) > claimed:
+            claimed += 1
+            yield next_result()
+
+    async def _request_chunked(self, url_suffix, params, fields, chunk_size,
+                               step, max_workers):
+        chunk_params = self._chunk_params(params, chunk_size, step)
+        if len(chunk_params) <= 1:
+            return await self._request(url_suffix, params, fields)
+        refresh = self._is_refreshing()
+        responses = await asyncio.gather(*[
+            self._make_chunk_request(url_suffix, p, refresh)
+            for p in chunk_params])
+        return self._wrap(stitch_responses(responses), url_suffix, fields)
+
+    async def _request(self, url_suffix, params, fields,
+                       response_type='forecast'):
+        response = await self._make_request(
+                url_suffix=url_suffix, params=params)
+        return self._wrap(response, url_suffix, fields, response_type)
+
+    async def _make_chunk_request(self, url_suffix, params, refresh):
+        # gather runs every chunk in a task of its own, so carry refreshing
+        # over to it
+        if not refresh:
+            return await self._make_request(url_suffix, params)
+        with self.refreshing():
+            return await self._make_request(url_suffix, params)
+
+    async def _make_request(self, url_suffix, params):
+        if not self.instruments:
+            return (await self._get_response(url_suffix, params))[0]
+        started = time.perf_counter()
+        try:
+            response, outcome = await self._get_response(url_suffix, params)
+        except Exception as e:
+            self._report_request(url_suffix, 'miss', started, error=e)
+            raise
+        self._report_request(url_suffix, outcome, started, response)
+        return response
+
+    async def _get_response(self, url_suffix, params):
+        params = self._snap(params)
+        refresh = self._is_refreshing()
+        lookup = await self._cache_io(self._cache_lookup, url_suffix, params,
+                                      refresh)
+        served = self._serve_local(url_suffix, params, refresh, lookup)
+        if served is not None:
+            return served
+
+        key, ttl, fields, _, stale = lookup
+        try:
+            response = await self._fetch_shared(url_suffix, params, key, ttl,
+                                                fields)
+        except (OSError, asyncio.TimeoutError) + _client_errors():
+            served = self._serve_stale_on_error(stale)
+            if served is None:
+                raise
+            return served
+        served = self._serve_stale_on_error(stale, response)
+        return served if served is not None else (response, 'miss')
+
+    async def _fetch_shared(self, url_suffix, params, key, ttl, fields):
+        if self._flights is not None:
+            return await self._flights.do(key, self._fetch, url_suffix,
+                                          params, key, ttl, fields=fields)
+        return await self._fetch(url_suffix, params, key, ttl, fields=fields)
+
+    def _revalidate(self, url_suffix, params, key, ttl, fields):
+        if key in self._revalidating:
+            return
+        task = asyncio.ensure_future(
+                self._fetch_shared(url_suffix, params, key, ttl, fields))
+        self._revalidating[key] = task
+
+        def done(task):
+            self._revalidating.pop(key, None)
+            if not task.cancelled():
+                _log_failed_revalidation(url_suffix, params, task)
+
+        task.add_done_callback(done)
+
+    async def _fetch(self, url_suffix, params, key, ttl, fields=None):
+        if fields is not None:
+            params = dict(params, fields=",".join(sorted(fields)))
+        response = await self._send(url_suffix, params)
+        await self._cache_io(self._cache_store, key, ttl, response, fields)
+        self._index_store(url_suffix, params, response)
+        return response
+
+    async def _cache_io(self, fn, *args):
+        if not self._blocking_cache:
+            return fn(*args)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    def _is_refreshing(self):
+        task = _current_task()
+        return task is not None and task in self._refreshing_tasks
+
+    async def _send(self, url_suffix, params):
+        self._check_online(url_suffix, params)
+        policy = self._retry_policy(url_suffix)
+        if policy is None:
+            return await self._send_once(url_suffix, params, self.timeout)
+
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        attempt = 0
+        while True:
+            attempt += 1
+            response = exception = None
+            timeout = self._timeout(policy.remaining(loop.time() - started))
+            try:
+                response = await self._send_once(url_suffix, params, timeout)
+            except CircuitOpenError:
+                raise
+            except (OSError, asyncio.TimeoutError) + _client_errors() as e:
+                exception = e
+
+            delay = _retry_delay(policy, attempt, loop.time() - started,
+                                 response, exception)
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
+
+    async def _send_once(self, url_suffix, params, timeout):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(
+                    self.rate_limiter.priority(url_suffix))
+        try:
+            response = await self._get(url_suffix, params, timeout)
+        except Exception as e:
+            self._record_outcome(url_suffix, exception=e)
+            raise
+        self._record_outcome(url_suffix, response)
+        return response
+
+    async def _get(self, url_suffix, params, timeout):
+        kwargs = {}
+        client_timeout = _client_timeout(timeout)
+        if client_timeout is not None:
+            kwargs['timeout'] = client_timeout
+        async with self._get_semaphore():
+            session = self._get_session()
+            self._pool["requests"] += 1
+            started = time.perf_counter()
+            async with session.get(self.BASE_URL + url_suffix,
+                                   params=params, **kwargs) as response:
+                elapsed = time.perf_counter() - started
+                content = await response.read()
+                built = build_response(
+                        status_code=response.status,
+                        headers=response.headers,
+                        content=content,
+                        url=str(response.url),
+                        reason=response.reason)
+                # Time to the headers, like requests' Response.elapsed
+                built.elapsed = timedelta(seconds=elapsed)
+                return built
+
+
+def _current_task():
+    try:
+        current = asyncio.current_task
+    except AttributeError:
+        # Python < 3.7
+        current = asyncio.Task.current_task
+    try:
+        return current()
+    except RuntimeError:
+        # No running event loop
+        return None
+
+
+def _client_errors():
+    try:
+        import aiohttp
+    except ImportError:
+        return ()
+    return (aiohttp.ClientError,)
+
+
+def _client_timeout(timeout):
+    # requests style (connect, read) timeout to an aiohttp.ClientTimeout
+    if timeout is None:
+        return None
+    try:
+        import aiohttp
+    except ImportError:
+        return None
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
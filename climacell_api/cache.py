@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from climacell_api.transport import (body_headers, build_response,
+                                     strip_apikey)
+
+# Seconds a successful response stays fresh, per endpoint. Endpoints that are
+# not listed are never cached.
+DEFAULT_TTLS = {
+    "/weather/realtime": 60,
+    "/weather/nowcast": 60,
+    "/weather/forecast/hourly": 15 * 60,
+    "/weather/forecast/daily": 60 * 60,
+    "/weather/historical/climacell": 5 * 60,
+    "/weather/historical/station": 15 * 60,
+    "/insights/fire-index": 24 * 60 * 60,
+}
+
+
+def cache_key(url_suffix, params):
+    """
+    Normalized key for a request: the endpoint plus its params sorted by name,
+    with the api key left out, the fields list sorted and lat and lon as
+    floats so the same request always maps to the same key.
+
+    :param string url_suffix: Endpoint path, e.g. '/weather/realtime'
+    :param dict params: Query params of the request
+
+    :returns: Hashable cache key
+    :rtype: tuple
+    """
+
+    items = []
+    for name, value in params.items():
+        if name == "apikey":
+            continue
+        if name == "fields":
+            value = ",".join(sorted(value.split(",")))
+        elif name in ("lat", "lon"):
+            # 12, 12.0 and '12' are the same location
+            try:
+                value = repr(float(value))
+            except (TypeError, ValueError):
+                pass
+        items.append((name, str(value)))
+    return (url_suffix,) + tuple(sorted(items))
+
+
+class CacheEntry:
+    """
+    A cached response together with when it was stored and for how long it
+    stays fresh. fields is the set of fields the response holds when it was
+    fetched with merged fields, None otherwise.
+    """
+
+    def __init__(self, response, stored_at, ttl, fields=None):
+        self.response = response
+        self.stored_at = stored_at
+        self.ttl = ttl
+        self.fields = fields
+
+    @property
+    def expires_at(self):
+        return self.stored_at + self.ttl
+
+    def age(self, now=None):
+        return (time.time() if now is None else now) - self.stored_at
+
+    def is_fresh(self, now=None):
+        return self.age(now) < self.ttl
+
+    def is_usable(self, max_stale=0, now=None):
+        # Fresh, or expired less than max_stale seconds ago
+        return self.age(now) < self.ttl + max_stale
+
+
+class CacheBackend:
+    """
+    Interface for response cache backends used by ClimacellApiClient.
+
+    get() returns the CacheEntry stored under a key or None, set() stores one.
+    get() is called with max_stale when the client serves stale responses,
+    and should then also return entries that expired less than max_stale
+    seconds ago. Backends are responsible for dropping expired entries and
+    keep hit, miss and eviction counts in stats.
+    """
+
+    def __init__(self):
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, max_stale=0):
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _count(self, stat, amount=1):
+        self.stats[stat] += amount
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process LRU cache. Once maxsize entries are stored, the least recently
+    used one is evicted to make room.
+    """
+
+    def __init__(self, maxsize=1024):
+        super().__init__()
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, max_stale=0):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_usable(max_stale):
+                if entry is not None:
+                    del self._entries[key]
+                self._count("misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count("hits")
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._count("evictions")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache(CacheBackend):
+    """
+    Cache stored as one file per entry in a directory, so it survives
+    restarts and can be shared by processes on the same host. Files are
+    written atomically, as a line of json metadata followed by the raw body,
+    so reading them never runs code. When maxsize is set, the least recently
+    read entries are evicted in batches: once the directory holds a tenth
+    more than maxsize entries, it is trimmed back to maxsize.
+    """
+
+    SUFFIX = ".ccache"
+
+    def __init__(self, directory, maxsize=None):
+        super().__init__()
+        self.directory = directory
+        self.maxsize = maxsize
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Entries in the directory as far as this process knows. Other
+        # processes' writes are picked up when it is trimmed.
+        self._size = len(self._paths()) if maxsize is not None else 0
+
+    def get(self, key, max_stale=0):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                meta, _, content = f.read().partition(b"\n")
+            meta = json.loads(meta.decode("utf-8"))
+            fields = meta["fields"]
+            entry = CacheEntry(
+                    build_response(meta["status_code"], meta["headers"],
+                                   content, meta["url"], meta["reason"]),
+                    meta["stored_at"], meta["ttl"],
+                    frozenset(fields) if fields is not None else None)
+        except (OSError, ValueError, KeyError, TypeError):
+            self._count("misses")
+            return None
+
+        if not entry.is_usable(max_stale):
+            self._remove(path)
+            self._count("misses")
+            return None
+
+        # Bump the modification time so eviction sees it as recently used
+        os.utime(path, None)
+        self._count("hits")
+        return entry
+
+    def set(self, key, entry):
+        response = entry.response
+        meta = {
+            "stored_at": entry.stored_at,
+            "ttl": entry.ttl,
+            "fields": (sorted(entry.fields) if entry.fields is not None
+                       else None),
+            "status_code": response.status_code,
+            "headers": body_headers(response.headers),
+            "url": strip_apikey(response.url),
+            "reason": response.reason,
+        }
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n")
+            f.write(response.content)
+        if self.maxsize is None:
+            os.replace(tmp_path, path)
+            return
+
+        added = not os.path.exists(path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += added
+            if self._size <= self.maxsize + self.maxsize // 10:
+                return
+            self._evict()
+
+    def clear(self):
+        for path in self._paths():
+            self._remove(path)
+        with self._lock:
+            self._size = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + self.SUFFIX)
+
+    def _paths(self):
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith(self.SUFFIX)]
+
+    def _evict(self):
+        paths = self._paths()
+        self._size = len(paths)
+        if len(paths) <= self.maxsize:
+            return
+        paths.sort(key=self._mtime)
+        for path in paths[:len(paths) - self.maxsize]:
+            self._remove(path)
+            self._count("evictions")
+        self._size = self.maxsize
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
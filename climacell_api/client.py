@@ -1,12 +1,213 @@
+import copy
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
 import requests
-from climacell_api.climacell_response import ClimacellResponse
+
+from climacell_api import json_backend
+from climacell_api.cache import DEFAULT_TTLS, CacheEntry, cache_key
+
+from climacell_api.climacell_response import (ClimacellResponse, ErrorData,
+                                              LocationResult, RawResponse,
+                                              parse_time)
+from climacell_api.metrics import RequestEvent
+from climacell_api.retry import DEFAULT_TIMEOUT, CircuitOpenError
+from climacell_api.singleflight import SingleFlight
+from climacell_api.transport import (build_response, create_session,
+                                     pool_stats, wire_bytes)
+
+logger = logging.getLogger(__name__)
+
+# Longest time window requested in one call per historical endpoint. Longer
+# windows are split into chunks that are fetched in parallel. Historical
+# ClimaCell data only goes 6 hours back, so it is not split by default.
+DEFAULT_CHUNK_SIZES = {
+    "/weather/historical/station": timedelta(days=1),
+}
 
 
 class ClimacellApiClient:
     BASE_URL = "https://api.climacell.co/v3"
+    # Shares upstream calls when coalescing or merging fields
+    _flight_class = SingleFlight
+
+    def __init__(self, key, session=None, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, keep_alive=True,
+                 cache=None, cache_ttls=None, snap_resolution=None,
+                 coalesce=False, merge_fields=False, stream=False,
+                 rate_limiter=None, retry=None, circuit_breaker=None,
+                 timeout=DEFAULT_TIMEOUT, store=None, offline=False,
+                 instruments=None, spatial_index=None,
+                 stale_while_revalidate=None, stale_if_error=None,
+                 passthrough=False, chunk_sizes=None):
+        """
+        :param string key: ClimaCell API key
+        :param requests.Session session: Optional session to send requests
+        through, e.g. one with a custom transport adapter mounted. When
+        given, the pool options below are ignored and the caller owns it
+        :param int pool_connections: Number of per-host pools to keep around
+        :param int pool_maxsize: Maximum connections kept open per host
+        :param bool pool_block: Block when a host has no free connection
+        :param bool keep_alive: Reuse connections between requests
+        :param CacheBackend cache: Optional response cache, e.g. MemoryCache
+        :param dict cache_ttls: Seconds responses stay fresh per endpoint
+        path, overriding climacell_api.cache.DEFAULT_TTLS
+        :param float snap_resolution: Round lat and lon to a grid of this
+        many degrees before requesting, so nearby points share a request
+        :param bool coalesce: Share one upstream call between concurrent
+        identical requests
+        :param bool merge_fields: Share upstream calls and cache entries
+        between requests for the same endpoint and location by requesting
+        the union of their fields. data() is still scoped to each caller's
+        fields, but json() returns the widened payload
+        :param bool stream: Return responses before their body is
+        downloaded, for use with ClimacellResponse.iter_data(). Streamed
+        requests bypass the cache and request coalescing
+        :param RateLimiter rate_limiter: Wait for a token before every
+        request sent upstream. Cached responses do not use a token
+        :param retry: RetryPolicy for every endpoint, or a dictionary of
+        RetryPolicy per endpoint path. No retries by default
+        :param CircuitBreaker circuit_breaker: Fail fast with
+        CircuitOpenError while upstream keeps failing
+        :param timeout: (connect, read) timeout in seconds, or one number for
+        both
+        :param ResponseStore store: Persistent store read on cache misses
+        and written with every successful response
+        :param bool offline: Only replay responses from the store, whatever
+        their age, and never call the API
+        :param list instruments: Instrument hooks told about every request
+        and every data() or to_columns() call, e.g. HistogramCollector
+        :param SpatialIndex spatial_index: Answer realtime requests from the
+        nearest location fetched recently enough, see SpatialIndex
+        :param float stale_while_revalidate: Seconds after expiry during
+        which a cached response is still returned, marked stale, while it is
+        refreshed in the background
+        :param float stale_if_error: Seconds after expiry during which a
+        cached response is returned, marked stale, when refreshing it fails
+        with a connection error, a timeout, a 5xx or a 429 response
+        :param bool passthrough: Return RawResponse objects, which expose the
+        body as a memoryview and the headers to forward it with, for proxies
+        that pass responses on without decoding them
+        :param dict chunk_sizes: Longest time window requested in one call
+        per historical endpoint path, overriding DEFAULT_CHUNK_SIZES. None
+        turns chunking off for an endpoint
+        """
 
-    def __init__(self, key):
         self.key = key
+        self._init_cache(cache, cache_ttls, store, offline,
+                         stale_while_revalidate, stale_if_error)
+        self.spatial_index = spatial_index
+        self.snap_resolution = snap_resolution
+        self.merge_fields = merge_fields
+        self.stream = stream
+        self.passthrough = passthrough
+        self.chunk_sizes = dict(DEFAULT_CHUNK_SIZES)
+        if chunk_sizes is not None:
+            self.chunk_sizes.update(chunk_sizes)
+        self.instruments = tuple(instruments or ())
+        self._transfer = {}
+        self._transfer_lock = threading.Lock()
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self._flights = (self._flight_class() if coalesce or merge_fields
+                         else None)
+        self._owns_session = session is None
+        self._init_session(session, pool_connections=pool_connections,
+                           pool_maxsize=pool_maxsize, pool_block=pool_block,
+                           keep_alive=keep_alive)
+
+    def _init_session(self, session, pool_connections, pool_maxsize,
+                      pool_block, keep_alive):
+        if session is None:
+            session = create_session(pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize,
+                                     pool_block=pool_block,
+                                     keep_alive=keep_alive)
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close pooled connections held by the client. Injected sessions are
+        left open for their owner to close. Background revalidations still
+        running are waited for first.
+        """
+
+        if self._revalidator is not None:
+            self._revalidator.shutdown()
+            self._revalidator = None
+        if self._owns_session:
+            self.session.close()
+
+    def pool_stats(self):
+        """
+        Connection pool usage of the client's session.
+
+        :returns: Dictionary with 'requests', 'hits' and 'misses' counts
+        :rtype: dict
+        """
+
+        return pool_stats(self.session)
+
+    @contextmanager
+    def refreshing(self):
+        """
+        Context manager within which requests made from the current thread
+        skip cache reads, so they go upstream and refresh the cache even
+        when it holds a fresh response.
+        """
+
+        previous = self._is_refreshing()
+        self._local.refresh = True
+        try:
+            yield self
+        finally:
+            self._local.refresh = previous
+
+    def transfer_stats(self):
+        """
+        Bytes downloaded from the API per endpoint, for every response
+        received upstream including retried ones. Cache hits and streamed
+        responses are not counted.
+
+        :returns: Dictionary per endpoint path with 'responses',
+        'wire_bytes' (as sent, before content decoding) and 'body_bytes'
+        (after decoding) counts
+        :rtype: dict
+        """
+
+        with self._transfer_lock:
+            return {url_suffix: dict(stats)
+                    for url_suffix, stats in self._transfer.items()}
+
+    def snap(self, lat, lon):
+        """
+        The location requests for lat and lon are sent for, rounded to the
+        snap_resolution grid when the client has one.
+
+        :param float lat: Latitude of location
+        :param float lon: Longitude of location
+
+        :returns: (lat, lon) pair
+        :rtype: tuple
+        """
+
+        if self.snap_resolution is None:
+            return lat, lon
+        return (snap_coordinate(lat, self.snap_resolution),
+                snap_coordinate(lon, self.snap_resolution))
 
     def realtime(self, lat, lon, fields, units='si'):
         """
@@ -30,10 +231,9 @@ class ClimacellApiClient:
             "apikey": self.key
         }
 
-        response = self._make_request(
-                url_suffix="/weather/realtime", params=params)
-        return ClimacellResponse(request_response=response, fields=fields,
-                                 response_type='realtime')
+        return self._request(
+                url_suffix="/weather/realtime", params=params,
+                fields=fields, response_type='realtime')
 
     def nowcast(self, lat, lon, timestep, fields,
                 start_time='now', end_time=None, units='si'):
@@ -67,9 +267,9 @@ class ClimacellApiClient:
         if end_time is not None:
             params["end_time"] = end_time
 
-        response = self._make_request(
-                url_suffix="/weather/nowcast", params=params)
-        return ClimacellResponse(request_response=response, fields=fields)
+        return self._request(
+                url_suffix="/weather/nowcast", params=params,
+                fields=fields)
 
     def forecast_hourly(self, lat, lon, fields, start_time='now',
                         end_time=None, units='si'):
@@ -100,9 +300,9 @@ class ClimacellApiClient:
         if end_time is not None:
             params["end_time"] = end_time
 
-        response = self._make_request(
-                url_suffix="/weather/forecast/hourly", params=params)
-        return ClimacellResponse(request_response=response, fields=fields)
+        return self._request(
+                url_suffix="/weather/forecast/hourly", params=params,
+                fields=fields)
 
     def forecast_daily(self, lat, lon, fields, start_time='now',
                        end_time=None, units='si'):
@@ -133,13 +333,13 @@ class ClimacellApiClient:
         if end_time is not None:
             params["end_time"] = end_time
 
-        response = self._make_request(
-                url_suffix="/weather/forecast/daily", params=params)
-        return ClimacellResponse(request_response=response, fields=fields,
-                                 response_type='daily_forecast')
+        return self._request(
+                url_suffix="/weather/forecast/daily", params=params,
+                fields=fields, response_type='daily_forecast')
 
     def historical_climacell(self, lat, lon, fields, timestep, start_time,
-                             end_time='now', units='si'):
+                             end_time='now', units='si', chunk_size=None,
+                             max_workers=4):
         """
         Historical ClimaCell data for up to 6 hours in the past
 
@@ -150,6 +350,11 @@ class ClimacellApiClient:
         :param string start_time: Datetime ISO 8601 string
         :param string end_time: Either 'now' or datetime ISO 8601 string
         :param string units: Either scientific ('si') or US ('us')
+        :param timedelta chunk_size: Split the window into chunks of at most
+        this size, rounded down to a multiple of timestep, fetch them in
+        parallel and stitch the results back together. Defaults to the
+        client's chunk_sizes for the endpoint, unless streaming
+        :param int max_workers: Maximum number of chunks fetched at once
 
         :returns: Request response object with data() as a list of
         ObservationData
@@ -167,12 +372,20 @@ class ClimacellApiClient:
             "apikey": self.key
         }
 
-        response = self._make_request(
-                url_suffix="/weather/historical/climacell", params=params)
-        return ClimacellResponse(request_response=response, fields=fields)
+        chunk_size = self._chunk_size("/weather/historical/climacell",
+                                      chunk_size)
+        if chunk_size:
+            return self._request_chunked(
+                    url_suffix="/weather/historical/climacell", params=params,
+                    fields=fields, chunk_size=chunk_size,
+                    step=timedelta(minutes=timestep), max_workers=max_workers)
+        return self._request(
+                url_suffix="/weather/historical/climacell", params=params,
+                fields=fields)
 
     def historical_station(self, lat, lon, fields, start_time,
-                           end_time='now', units='si'):
+                           end_time='now', units='si', chunk_size=None,
+                           max_workers=4):
         """
         Historical weather station data for up to 4 weeks in the past
 
@@ -183,6 +396,11 @@ class ClimacellApiClient:
         :param string start_time: Datetime ISO 8601 string
         :param string end_time: Either 'now' or datetime ISO 8601 string
         :param string units: Either scientific ('si') or US ('us')
+        :param timedelta chunk_size: Split the window into chunks of at most
+        this size, rounded down to whole minutes, fetch them in parallel and
+        stitch the results back together. Defaults to the client's
+        chunk_sizes for the endpoint, unless streaming
+        :param int max_workers: Maximum number of chunks fetched at once
 
         :returns: Request response object with data() as a list of
         ObservationData
@@ -199,9 +417,16 @@ class ClimacellApiClient:
             "apikey": self.key
         }
 
-        response = self._make_request(
-                url_suffix="/weather/historical/station", params=params)
-        return ClimacellResponse(request_response=response, fields=fields)
+        chunk_size = self._chunk_size("/weather/historical/station",
+                                      chunk_size)
+        if chunk_size:
+            return self._request_chunked(
+                    url_suffix="/weather/historical/station", params=params,
+                    fields=fields, chunk_size=chunk_size,
+                    step=timedelta(minutes=1), max_workers=max_workers)
+        return self._request(
+                url_suffix="/weather/historical/station", params=params,
+                fields=fields)
 
     def insights_fire_index(self, lat, lon):
         """
@@ -226,10 +451,583 @@ class ClimacellApiClient:
             "apikey": self.key
         }
 
-        response = self._make_request(
-                url_suffix="/insights/fire-index", params=params)
-        return ClimacellResponse(request_response=response, fields=[],
-                                 response_type='fire_index')
+        return self._request(
+                url_suffix="/insights/fire-index", params=params, fields=[],
+                response_type='fire_index')
+
+    def realtime_many(self, locations, fields, units='si', max_workers=10):
+        """
+        Realtime data for many locations, fetched in parallel.
+
+        :param iterable locations: (lat, lon) pairs
+        :param list fields: List of data fields to pull
+        :param string units: Either scientific ('si') or US ('us')
+        :param int max_workers: Maximum number of requests in flight
+
+        :returns: Results in completion order, each tagged with its location
+        :rtype: generator of LocationResult
+        """
+
+        return self._fetch_many(self.realtime, locations, max_workers,
+                                fields=fields, units=units)
+
+    def nowcast_many(self, locations, timestep, fields, start_time='now',
+                     end_time=None, units='si', max_workers=10):
+        """
+        Nowcast data for many locations, fetched in parallel. See nowcast()
+        for the meaning of the other arguments.
+
+        :param iterable locations: (lat, lon) pairs
+        :param int max_workers: Maximum number of requests in flight
+
+        :returns: Results in completion order, each tagged with its location
+        :rtype: generator of LocationResult
+        """
+
+        return self._fetch_many(self.nowcast, locations, max_workers,
+                                timestep=timestep, fields=fields,
+                                start_time=start_time, end_time=end_time,
+                                units=units)
+
+    def forecast_hourly_many(self, locations, fields, start_time='now',
+                             end_time=None, units='si', max_workers=10):
+        """
+        Hourly forecast data for many locations, fetched in parallel. See
+        forecast_hourly() for the meaning of the other arguments.
+
+        :param iterable locations: (lat, lon) pairs
+        :param int max_workers: Maximum number of requests in flight
+
+        :returns: Results in completion order, each tagged with its location
+        :rtype: generator of LocationResult
+        """
+
+        return self._fetch_many(self.forecast_hourly, locations, max_workers,
+                                fields=fields, start_time=start_time,
+                                end_time=end_time, units=units)
+
+    def forecast_daily_many(self, locations, fields, start_time='now',
+                            end_time=None, units='si', max_workers=10):
+        """
+        Daily forecast data for many locations, fetched in parallel. See
+        forecast_daily() for the meaning of the other arguments.
+
+        :param iterable locations: (lat, lon) pairs
+        :param int max_workers: Maximum number of requests in flight
+
+        :returns: Results in completion order, each tagged with its location
+        :rtype: generator of LocationResult
+        """
+
+        return self._fetch_many(self.forecast_daily, locations, max_workers,
+                                fields=fields, start_time=start_time,
+                                end_time=end_time, units=units)
+
+    def _fetch_many(self, endpoint, locations, max_workers, **kwargs):
+        # Only max_workers locations are pulled from the iterable at a time,
+        # so a long or lazy iterable never piles up queued futures.
+        locations = iter(locations)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+
+            def submit_next():
+                for lat, lon in locations:
+                    future = executor.submit(endpoint, lat, lon, **kwargs)
+                    pending[future] = (lat, lon)
+                    return
+
+            for _ in range(max_workers):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    location = pending.pop(future)
+                    submit_next()
+                    yield self._location_result(location, future)
+
+    @staticmethod
+    def _location_result(location, future):
+        exception = future.exception()
+        if exception is not None:
+            return LocationResult(location, error=ErrorData({
+                'errorCode': type(exception).__name__,
+                'message': str(exception)}))
+        return LocationResult(location, response=future.result())
+
+    def _request_chunked(self, url_suffix, params, fields, chunk_size, step,
+                         max_workers):
+        chunk_params = self._chunk_params(params, chunk_size, step)
+        if len(chunk_params) <= 1:
+            return self._request(url_suffix, params, fields)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            responses = list(executor.map(
+                    lambda p: self._make_request(url_suffix, p),
+                    chunk_params))
+        return self._wrap(stitch_responses(responses), url_suffix, fields)
+
+    def _chunk_size(self, url_suffix, chunk_size):
+        # A streamed body is parsed as it arrives, stitching would read it
+        # whole, so only chunk streamed requests when asked to
+        if chunk_size is None and not self.stream:
+            return self.chunk_sizes.get(url_suffix)
+        return chunk_size
+
+    @staticmethod
+    def _chunk_params(params, chunk_size, step):
+        windows = split_window(to_datetime(params["start_time"]),
+                               to_datetime(params["end_time"]),
+                               chunk_size, step)
+        return [dict(params, start_time=start.isoformat(),
+                     end_time=end.isoformat()) for start, end in windows]
+
+    def _request(self, url_suffix, params, fields, response_type='forecast'):
+        response = self._make_request(url_suffix=url_suffix, params=params)
+        return self._wrap(response, url_suffix, fields, response_type)
+
+    def _wrap(self, response, url_suffix, fields, response_type='forecast'):
+        response_class = RawResponse if self.passthrough else ClimacellResponse
+        return response_class(request_response=response, fields=fields,
+                              response_type=response_type,
+                              endpoint=url_suffix,
+                              instruments=self.instruments,
+                              age=getattr(response, "stale_age", None))
 
     def _make_request(self, url_suffix, params):
-        return requests.get(self.BASE_URL + url_suffix, params=params)
+        if not self.instruments:
+            return self._get_response(url_suffix, params)[0]
+        started = time.perf_counter()
+        try:
+            response, outcome = self._get_response(url_suffix, params)
+        except Exception as e:
+            self._report_request(url_suffix, 'miss', started, error=e)
+            raise
+        self._report_request(url_suffix, outcome, started, response)
+        return response
+
+    def _get_response(self, url_suffix, params):
+        # Returns the response and where it came from: 'hit', 'stale',
+        # 'nearest', 'miss' or 'bypass'
+        params = self._snap(params)
+        if self.stream:
+            # A streamed body can only be read once, so it cannot be shared
+            return self._send(url_suffix, params), 'bypass'
+
+        refresh = self._is_refreshing()
+        lookup = self._cache_lookup(url_suffix, params, refresh)
+        served = self._serve_local(url_suffix, params, refresh, lookup)
+        if served is not None:
+            return served
+
+        key, ttl, fields, _, stale = lookup
+        try:
+            response = self._fetch_shared(url_suffix, params, key, ttl,
+                                          fields)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout):
+            served = self._serve_stale_on_error(stale)
+            if served is None:
+                raise
+            return served
+        served = self._serve_stale_on_error(stale, response)
+        return served if served is not None else (response, 'miss')
+
+    def _serve_local(self, url_suffix, params, refresh, lookup):
+        # Answers from the cache, the spatial index or a stale entry being
+        # revalidated, without waiting on upstream. None if none can.
+        key, ttl, fields, response, stale = lookup
+        if response is not None:
+            return response, 'hit'
+        response = self._nearest(url_suffix, params, refresh)
+        if response is not None:
+            return response, 'nearest'
+        if self._can_serve(stale, self.stale_while_revalidate):
+            self._revalidate(url_suffix, params, key, ttl, fields)
+            return self._stale_response(stale), 'stale'
+        return None
+
+    def _serve_stale_on_error(self, stale, response=None):
+        # The stale entry in place of a failed request, or of an upstream
+        # error response, when stale_if_error allows it
+        if response is not None and not _is_upstream_error(response):
+            return None
+        if not self._can_serve(stale, self.stale_if_error):
+            return None
+        return self._stale_response(stale), 'stale'
+
+    def _fetch_shared(self, url_suffix, params, key, ttl, fields):
+        if self._flights is not None:
+            return self._flights.do(key, self._fetch, url_suffix, params,
+                                    key, ttl, fields=fields)
+        return self._fetch(url_suffix, params, key, ttl, fields=fields)
+
+    def _revalidate(self, url_suffix, params, key, ttl, fields):
+        # Refreshes a stale entry in the background, once per key at a time
+        with self._revalidate_lock:
+            if key in self._revalidating:
+                return
+            if self._revalidator is None:
+                self._revalidator = ThreadPoolExecutor(max_workers=4)
+            future = self._revalidator.submit(
+                    self._fetch_shared, url_suffix, params, key, ttl, fields)
+            self._revalidating[key] = future
+
+        def done(future):
+            with self._revalidate_lock:
+                self._revalidating.pop(key, None)
+            _log_failed_revalidation(url_suffix, params, future)
+
+        future.add_done_callback(done)
+
+    def _report_request(self, url_suffix, outcome, started, response=None,
+                        error=None):
+        event = RequestEvent(url_suffix, outcome,
+                             total=time.perf_counter() - started)
+        if response is not None:
+            event.status_code = response.status_code
+            if outcome in ('miss', 'bypass'):
+                event.ttfb = response.elapsed.total_seconds()
+            if outcome == 'bypass':
+                length = response.headers.get('Content-Length')
+                event.bytes = int(length) if length else None
+            else:
+                event.bytes = len(response.content)
+            if outcome == 'miss':
+                event.wire_bytes = wire_bytes(response)
+        if error is not None:
+            event.error = type(error).__name__
+        for instrument in self.instruments:
+            instrument.on_request(event)
+
+    def _fetch(self, url_suffix, params, key, ttl, fields=None):
+        # fields is only set when merging, and may be wider than requested
+        if fields is not None:
+            params = dict(params, fields=",".join(sorted(fields)))
+        response = self._send(url_suffix, params)
+        self._cache_store(key, ttl, response, fields)
+        self._index_store(url_suffix, params, response)
+        return response
+
+    def _send(self, url_suffix, params):
+        self._check_online(url_suffix, params)
+        policy = self._retry_policy(url_suffix)
+        if policy is None:
+            return self._send_once(url_suffix, params, self.timeout)
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            response = exception = None
+            timeout = self._timeout(
+                    policy.remaining(time.monotonic() - started))
+            try:
+                response = self._send_once(url_suffix, params, timeout)
+            except CircuitOpenError:
+                raise
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                exception = e
+
+            delay = _retry_delay(policy, attempt, time.monotonic() - started,
+                                 response, exception)
+            if delay is None:
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    def _send_once(self, url_suffix, params, timeout):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request()
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.rate_limiter.priority(url_suffix))
+        try:
+            response = self.session.get(self.BASE_URL + url_suffix,
+                                        params=params, stream=self.stream,
+                                        timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            self._record_outcome(url_suffix, exception=e)
+            raise
+        self._record_outcome(url_suffix, response)
+        return response
+
+    def _record_outcome(self, url_suffix, response=None, exception=None):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(response=response,
+                                        exception=exception)
+        if response is not None and not self.stream:
+            self._count_transfer(url_suffix, response)
+
+    def _count_transfer(self, url_suffix, response):
+        wire = wire_bytes(response)
+        body = len(response.content)
+        with self._transfer_lock:
+            stats = self._transfer.setdefault(url_suffix, {
+                "responses": 0, "wire_bytes": 0, "body_bytes": 0})
+            stats["responses"] += 1
+            stats["wire_bytes"] += wire
+            stats["body_bytes"] += body
+
+    def _retry_policy(self, url_suffix):
+        if isinstance(self.retry, dict):
+            return self.retry.get(url_suffix)
+        return self.retry
+
+    def _timeout(self, remaining=None):
+        # Caps the connect and read timeouts by what is left of a retry
+        # deadline
+        timeout = self.timeout
+        if remaining is None or timeout is None:
+            return timeout
+        if isinstance(timeout, tuple):
+            return tuple(min(t, remaining) if t is not None else remaining
+                         for t in timeout)
+        return min(timeout, remaining)
+
+    def _snap(self, params):
+        if self.snap_resolution is None:
+            return params
+        params = dict(params)
+        params["lat"], params["lon"] = self.snap(params["lat"], params["lon"])
+        return params
+
+    def _init_cache(self, cache, cache_ttls, store=None, offline=False,
+                    stale_while_revalidate=None, stale_if_error=None):
+        if offline and store is None:
+            raise ValueError("offline mode needs a store to replay from")
+        self.cache = cache
+        self.cache_ttls = dict(DEFAULT_TTLS)
+        if cache_ttls is not None:
+            self.cache_ttls.update(cache_ttls)
+        self.store = store
+        self.offline = offline
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        # Expired entries are kept this many seconds to be served stale
+        self._max_stale = max(stale_while_revalidate or 0,
+                              stale_if_error or 0)
+        self._revalidating = {}
+        self._revalidate_lock = threading.Lock()
+        self._revalidator = None
+        self._local = threading.local()
+
+    def _cache_lookup(self, url_suffix, params, refresh=False):
+        # Returns the request key, the cache ttl (None when not caching),
+        # the fields to fetch when merging fields (None otherwise), the
+        # cached response if there is a fresh one, and otherwise the expired
+        # entry if it may still be served stale. refresh skips the cache.
+        fields = None
+        if self.merge_fields and params.get("fields"):
+            fields = frozenset(params["fields"].split(","))
+            params = dict(params)
+            del params["fields"]
+        key = cache_key(url_suffix, params)
+
+        ttl = self.cache_ttls.get(url_suffix)
+        if (self.cache is None and self.store is None) or not ttl:
+            return key, None, fields, None, None
+        if refresh and fields is None:
+            return key, ttl, fields, None, None
+
+        max_stale = self._max_stale
+        if fields is not None:
+            # An entry expired less than a ttl ago still tells which fields
+            # to fetch. _get_response only serves it within its windows.
+            max_stale = max(max_stale, ttl)
+        entry = self._cached_entry(key, ttl, max_stale)
+        if entry is None:
+            return key, ttl, fields, None, None
+        covered = fields is None or (entry.fields is not None
+                                     and fields <= entry.fields)
+        if fields is not None and entry.fields is not None:
+            # Widen so a refetched entry keeps serving the earlier fields
+            fields = fields | entry.fields
+        if refresh or not covered:
+            return key, ttl, fields, None, None
+        if self.offline or entry.is_fresh():
+            return key, ttl, fields, entry.response, None
+        return key, ttl, fields, None, entry
+
+    def _cached_entry(self, key, ttl, max_stale=0):
+        entry = None
+        if self.cache is not None:
+            if max_stale:
+                entry = self.cache.get(key, max_stale)
+            else:
+                entry = self.cache.get(key)
+        if entry is None and self.store is not None:
+            entry = self.store.get(key, ttl)
+            if entry is None or not (self.offline
+                                     or entry.is_usable(max_stale)):
+                return None
+            if self.cache is not None:
+                self.cache.set(key, entry)
+        return entry
+
+    @staticmethod
+    def _can_serve(entry, window):
+        return entry is not None and bool(window) and entry.is_usable(window)
+
+    @staticmethod
+    def _stale_response(entry):
+        # A copy, so the cached response itself is not marked
+        response = copy.copy(entry.response)
+        response.stale_age = entry.age()
+        return response
+
+    def _cache_store(self, key, ttl, response, fields=None):
+        if not ttl or response.status_code != 200:
+            return
+        entry = CacheEntry(response, time.time(), ttl, fields=fields)
+        if self.cache is not None:
+            self.cache.set(key, entry)
+        if self.store is not None:
+            self.store.put(key, entry)
+
+    def _nearest(self, url_suffix, params, refresh=False):
+        if (self.spatial_index is None or url_suffix != "/weather/realtime"
+                or refresh):
+            return None
+        fields = frozenset(params.get("fields", "").split(","))
+        units = params.get("unit_system")
+        # A neighbour is never served for longer than the endpoint's TTL
+        found = self.spatial_index.nearest(
+                float(params["lat"]), float(params["lon"]),
+                match=lambda tag: tag[0] == units and fields <= tag[1],
+                max_age=self.cache_ttls.get(url_suffix) or 0)
+        return found[0] if found is not None else None
+
+    def _index_store(self, url_suffix, params, response):
+        if (self.spatial_index is None or url_suffix != "/weather/realtime"
+                or response.status_code != 200):
+            return
+        # The API answers for the requested (possibly snapped) location
+        self.spatial_index.add(
+                float(params["lat"]), float(params["lon"]), response,
+                tag=(params.get("unit_system"),
+                     frozenset(params.get("fields", "").split(","))))
+
+    def _is_refreshing(self):
+        return getattr(self._local, "refresh", False)
+
+    def _check_online(self, url_suffix, params):
+        if self.offline:
+            raise requests.exceptions.ConnectionError(
+                    "Offline and no stored response for {}".format(
+                        cache_key(url_suffix, params)))
+
+
+def _is_upstream_error(response):
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def _retry_delay(policy, attempt, elapsed, response, exception):
+    # Seconds to wait before the next attempt, None when the response is
+    # final. Raises the exception when it is final.
+    delay = policy.next_delay(attempt, elapsed, response, exception)
+    if delay is None and exception is not None:
+        raise exception
+    return delay
+
+
+def _log_failed_revalidation(url_suffix, params, future):
+    # Nobody waits on a background refresh, so its failures are logged here
+    error = future.exception()
+    if error is not None:
+        logger.warning("Revalidating %s for %s, %s failed", url_suffix,
+                       params.get('lat'), params.get('lon'), exc_info=error)
+    elif future.result().status_code != 200:
+        logger.warning("Revalidating %s for %s, %s failed with status %s",
+                       url_suffix, params.get('lat'), params.get('lon'),
+                       future.result().status_code)
+
+
+def snap_coordinate(value, resolution):
+    """
+    Round a coordinate to the nearest multiple of resolution degrees.
+
+    :param float value: Latitude or longitude
+    :param float resolution: Grid size in degrees
+
+    :returns: The snapped coordinate
+    :rtype: float
+    """
+
+    # The final round() drops float noise such as 40.050000000000004
+    return round(round(float(value) / resolution) * resolution, 6)
+
+
+def to_datetime(value):
+    """
+    Turn a start_time or end_time argument into an aware datetime.
+
+    :param value: 'now', an ISO 8601 string or a datetime. Naive values are
+    taken to be UTC
+
+    :rtype: datetime.datetime
+    """
+
+    if value == 'now':
+        return datetime.now(timezone.utc)
+    if not isinstance(value, datetime):
+        value = parse_time(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def split_window(start, end, chunk_size, step):
+    """
+    Split the time window between start and end into consecutive windows of
+    at most chunk_size. chunk_size is rounded down to a multiple of step, so
+    every chunk starts on the same step grid as the whole window.
+
+    :param datetime start: Start of the window
+    :param datetime end: End of the window
+    :param timedelta chunk_size: Maximum size of a chunk
+    :param timedelta step: Time between data points
+
+    :returns: (start, end) pairs, each chunk ending where the next starts
+    :rtype: list
+    """
+
+    chunk_size = max(chunk_size // step, 1) * step
+    windows = []
+    while start < end:
+        windows.append((start, min(start + chunk_size, end)))
+        start += chunk_size
+    return windows
+
+
+def stitch_responses(responses):
+    """
+    Concatenate the json lists of responses to consecutive time windows into
+    one response, dropping observations repeated at chunk boundaries. If any
+    response is an error, that response is returned instead.
+
+    :param list responses: Responses in time order
+
+    :rtype: requests.Response
+    """
+
+    for response in responses:
+        if response.status_code != 200:
+            return response
+
+    observations = []
+    seen = set()
+    for response in responses:
+        for o_json in json_backend.decode(response):
+            observation_time = o_json['observation_time']['value']
+            if observation_time not in seen:
+                seen.add(observation_time)
+                observations.append(o_json)
+
+    return build_response(
+            status_code=200,
+            headers={'Content-Type': 'application/json; charset=utf-8'},
+            content=json.dumps(observations).encode('utf-8'),
+            url=responses[0].url,
+            reason='OK')
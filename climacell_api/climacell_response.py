@@ -1,4 +1,100 @@
+import codecs
+import json
+import time
+from array import array
+from datetime import date, datetime, timedelta, timezone
+
 import dateutil.parser
+from dateutil.tz import tzutc
+
+from climacell_api import json_backend
+from climacell_api.metrics import ParseEvent
+
+_UTC = tzutc()
+_UNSET = object()
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+
+
+def parse_time(value):
+    """
+    Parse a timestamp returned by the API. The fixed formats the API uses,
+    'YYYY-MM-DDTHH:MM:SS[.fff]Z' and 'YYYY-MM-DD', are parsed directly and
+    anything else falls back to dateutil.
+
+    :param string value: ISO 8601 timestamp
+
+    :returns: Timezone aware datetime, or a naive one for plain dates
+    :rtype: datetime.datetime
+    """
+
+    parts = _split_time(value)
+    if parts is not None:
+        try:
+            if len(parts) == 3:
+                return datetime(*parts)
+            return datetime(*parts, tzinfo=_UTC)
+        except ValueError:
+            pass
+    return dateutil.parser.parse(value)
+
+
+def parse_epoch_us(value):
+    """
+    Parse a timestamp returned by the API to microseconds since the Unix
+    epoch, without building a datetime for the fixed formats the API uses.
+    Plain dates are taken as midnight UTC.
+
+    :param string value: ISO 8601 timestamp
+
+    :returns: Microseconds since 1970-01-01T00:00:00Z
+    :rtype: int
+    """
+
+    parts = _split_time(value)
+    if parts is not None and (len(parts) == 3 or (
+            parts[3] < 24 and parts[4] < 60 and parts[5] < 60)):
+        try:
+            days = date(*parts[:3]).toordinal() - _EPOCH_DAY
+        except ValueError:
+            pass
+        else:
+            if len(parts) == 3:
+                return days * 86400000000
+            hour, minute, second, microsecond = parts[3:]
+            return ((days * 86400 + hour * 3600 + minute * 60 + second)
+                    * 1000000 + microsecond)
+
+    time = dateutil.parser.parse(value)
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    delta = time - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _split_time(value):
+    # (year, month, day) for 'YYYY-MM-DD' and (year, month, day, hour,
+    # minute, second, microsecond) for 'YYYY-MM-DDTHH:MM:SS[.fff]Z', None
+    # for any other format
+    try:
+        if value[4] == '-' and value[7] == '-':
+            year = int(value[0:4])
+            month = int(value[5:7])
+            day = int(value[8:10])
+            if len(value) == 10:
+                return year, month, day
+            if (value[-1] == 'Z' and value[10] == 'T' and value[13] == ':'
+                    and value[16] == ':'):
+                microsecond = 0
+                if len(value) > 20:
+                    if value[19] != '.':
+                        return None
+                    microsecond = int((value[20:-1] + '00000')[:6])
+                return (year, month, day, int(value[11:13]),
+                        int(value[14:16]), int(value[17:19]), microsecond)
+    except (IndexError, ValueError):
+        pass
+    return None
 
 
 class ClimacellResponse:
@@ -10,36 +106,301 @@ class ClimacellResponse:
     object initialized with the ClimacellResponse object
     """
 
-    def __init__(self, request_response, fields, response_type='forecast'):
+    def __init__(self, request_response, fields, response_type='forecast',
+                 endpoint=None, instruments=(), age=None):
         self.request_response = request_response
         self.fields = fields
         self.response_type = response_type
+        self.endpoint = endpoint
+        self.instruments = instruments
+        # Seconds since a stale response was fetched, None when it is fresh
+        self.age = age
+        self.stale = age is not None
+        self._json = _UNSET
 
-    def data(self):
-        raw_json = self.request_response.json()
+    @classmethod
+    def from_json(cls, request_response, raw_json, fields, **kwargs):
+        """
+        Wrap a response whose body is already decoded. json(), data() and
+        to_columns() use raw_json as is instead of decoding the body.
+
+        :param requests.Response request_response: Response raw_json was
+        decoded from
+        :param raw_json: Decoded body
+        :param list fields: List of data fields to pull
+        :param kwargs: Other arguments of ClimacellResponse
+
+        :rtype: ClimacellResponse
+        """
+
+        response = cls(request_response, fields, **kwargs)
+        response._json = raw_json
+        return response
+
+    def json(self, **kwargs):
+        """
+        The decoded json body. It is decoded once, with the fastest json
+        library installed (see climacell_api.json_backend), and the same
+        object is returned on later calls and used by data() and
+        to_columns(), so do not modify it. Keyword arguments are passed to
+        json.loads through requests and skip the memoized body.
+        """
+
+        if kwargs:
+            return self.request_response.json(**kwargs)
+        if self._json is _UNSET:
+            self._json = json_backend.decode(self.request_response)
+        return self._json
+
+    def data(self, keep_raw_json=True):
+        """
+        :param bool keep_raw_json: When False, observations are parsed up
+        front and drop their raw_json, so they take about a third of the
+        memory (see benchmarks/memory_per_observation.py)
+
+        :returns: Data object, or list of them, for the endpoint
+        """
+
+        if not self.instruments:
+            return self._data(keep_raw_json)
+        started = time.perf_counter()
+        data = self._data(keep_raw_json)
+        self._report_parse('data', started, data)
+        return data
+
+    def _data(self, keep_raw_json):
+        if keep_raw_json or self._json is not _UNSET:
+            raw_json = self.json()
+        else:
+            # Not memoized, so the decoded body can be freed once parsed
+            raw_json = json_backend.decode(self.request_response)
         if self.status_code != 200:
             return ErrorData(raw_json)
 
         if self.response_type == 'realtime':
-            return ObservationData(raw_json, self.fields)
+            data = ObservationData(raw_json, self.fields)
         elif self.response_type == 'fire_index':
-            return FireIndexData(raw_json)
+            data = FireIndexData(raw_json)
         elif self.response_type == 'daily_forecast':
-            observations = []
+            data = []
             for o_json in raw_json:
-                observations.append(DailyObservationData(o_json, self.fields))
-            return observations
+                data.append(DailyObservationData(o_json, self.fields))
         else:
-            observations = []
+            data = []
             for o_json in raw_json:
-                observations.append(ObservationData(o_json, self.fields))
-            return observations
+                data.append(ObservationData(o_json, self.fields))
+
+        if not keep_raw_json:
+            if isinstance(data, list):
+                for observation in data:
+                    observation.drop_raw_json()
+            else:
+                data.drop_raw_json()
+        return data
+
+    def iter_data(self, chunk_size=64 * 1024):
+        """
+        Like data(), but parses list responses incrementally from the body
+        and yields one observation at a time, so a long response never has
+        to be decoded in one go. Create the client with stream=True to also
+        avoid downloading the whole body before the first observation.
+
+        :param int chunk_size: Bytes read from the body at a time
+
+        :returns: Observations, or a single ErrorData/realtime/fire index
+        data object for those responses
+        :rtype: generator
+        """
+
+        if (self.status_code != 200
+                or self.response_type in ('realtime', 'fire_index')):
+            yield self.data()
+            return
+
+        if self.response_type == 'daily_forecast':
+            observation_class = DailyObservationData
+        else:
+            observation_class = ObservationData
+        chunks = self.request_response.iter_content(chunk_size)
+        for o_json in _iter_json_array(chunks):
+            yield observation_class(o_json, self.fields)
+
+    def to_columns(self):
+        """
+        Column oriented view of the data that skips building an
+        ObservationData and Measurement object per timestep.
+
+        :returns: ColumnarData, or ErrorData for error responses
+        :rtype: ColumnarData
+        """
+
+        if not self.instruments:
+            return self._to_columns()
+        started = time.perf_counter()
+        columns = self._to_columns()
+        self._report_parse('to_columns', started, columns)
+        return columns
+
+    def _to_columns(self):
+        raw_json = self.json()
+        if self.status_code != 200:
+            return ErrorData(raw_json)
+        if self.response_type == 'fire_index':
+            raise ValueError("fire index responses have no columns")
+        if self.response_type == 'realtime':
+            raw_json = [raw_json]
+        return ColumnarData.from_json(raw_json, self.fields)
+
+    def datetimes(self):
+        """
+        Same as to_columns().datetimes().
+
+        :returns: Observation times as timezone aware UTC datetimes
+        :rtype: list
+        """
+
+        return self.to_columns().datetimes()
+
+    def to_numpy(self):
+        """
+        Same as to_columns().to_numpy(). Requires numpy.
+
+        :returns: Dictionary of numpy arrays keyed by column name
+        :rtype: dict
+        """
+
+        return self.to_columns().to_numpy()
+
+    def _report_parse(self, method, started, data):
+        duration = time.perf_counter() - started
+        if isinstance(data, ErrorData):
+            observations = 0
+        elif isinstance(data, (list, ColumnarData)):
+            observations = len(data)
+        else:
+            observations = 1
+        event = ParseEvent(self.endpoint, method, duration, observations)
+        for instrument in self.instruments:
+            instrument.on_parse(event)
 
     def __getattr__(self, attrib):
         return getattr(self.request_response, attrib)
 
 
+# Hop-by-hop headers, and those describing how the body was sent, which do
+# not apply to the decoded body when forwarding it
+_UNFORWARDED_HEADERS = frozenset((
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade', 'content-encoding',
+    'content-length'))
+
+
+class RawResponse(ClimacellResponse):
+    """
+    Response returned by clients created with passthrough=True, for proxies
+    that forward the ClimaCell payload unchanged. body is a read only view
+    of the body bytes, without copying them, and forward_headers() the
+    headers to send it with. Nothing is decoded unless json(), data() or
+    to_columns() is called.
+
+        response = client.forecast_hourly(...)
+        handler.send_response(response.status_code)
+        for name, value in response.forward_headers().items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(response.body)
+    """
+
+    @property
+    def body(self):
+        return memoryview(self.request_response.content)
+
+    def forward_headers(self):
+        """
+        The upstream headers, less the hop-by-hop ones and the content
+        encoding of the wire, with the Content-Length of the body.
+
+        :rtype: dict
+        """
+
+        headers = {name: value
+                   for name, value in self.request_response.headers.items()
+                   if name.lower() not in _UNFORWARDED_HEADERS}
+        headers['Content-Length'] = str(len(self.request_response.content))
+        return headers
+
+
+def _iter_json_array(chunks):
+    # Yields the items of a json array read from an iterable of utf-8 byte
+    # chunks, decoding each item as soon as it is complete.
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+    started = False
+
+    while True:
+        separators = ' \t\n\r,' if started else ' \t\n\r'
+        while pos < len(buffer) and buffer[pos] in separators:
+            pos += 1
+
+        item = _UNSET
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Expected a json array')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if exhausted:
+                    raise
+            # A number cut by the end of the chunk, e.g. '12.' of '12.5',
+            # decodes to a shorter one, so an item is only trusted once
+            # what follows it is read.
+            if item is not _UNSET and (exhausted or (
+                    end < len(buffer) and buffer[end] in ' \t\n\r,]')):
+                yield item
+                pos = end
+                continue
+
+        if exhausted:
+            raise ValueError('Unexpected end of json array')
+        buffer = buffer[pos:]
+        pos = 0
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += text_decoder.decode(b'', final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+
+class LocationResult:
+    """
+    Outcome of one location in a multi-location request. data() returns the
+    response data, or ErrorData when the request for this location raised.
+    """
+
+    def __init__(self, location, response=None, error=None):
+        self.location = location
+        self.response = response
+        self.error = error
+
+    def data(self):
+        if self.error is not None:
+            return self.error
+        return self.response.data()
+
+
 class ErrorData:
+    __slots__ = ('raw_json',)
 
     def __init__(self, raw_json):
         self.raw_json = raw_json
@@ -54,26 +415,59 @@ class ErrorData:
 
 
 class ObservationData:
+    """
+    observation_time and measurements are parsed on first access and cached.
+    """
+
+    __slots__ = ('raw_json', 'fields', '_lat', '_lon', '_observation_time',
+                 '_measurements')
 
     def __init__(self, raw_json, fields):
         self.raw_json = raw_json
         self.fields = fields
+        self._observation_time = None
+        self._measurements = None
 
     @property
     def lat(self):
+        if self.raw_json is None:
+            return self._lat
         return self.raw_json.get('lat')
 
     @property
     def lon(self):
+        if self.raw_json is None:
+            return self._lon
         return self.raw_json.get('lon')
 
+    def drop_raw_json(self):
+        """
+        Parse every property now and release raw_json, so only the parsed
+        values are kept in memory. raw_json is None afterwards.
+        """
+
+        if self.raw_json is not None:
+            self._lat = self.lat
+            self._lon = self.lon
+            self.observation_time
+            self.measurements
+            self.raw_json = None
+        return self
+
     @property
     def observation_time(self):
-        return dateutil.parser.parse(
-                self.raw_json['observation_time']['value'])
+        if self._observation_time is None:
+            self._observation_time = parse_time(
+                    self.raw_json['observation_time']['value'])
+        return self._observation_time
 
     @property
     def measurements(self):
+        if self._measurements is None:
+            self._measurements = self._parse_measurements()
+        return self._measurements
+
+    def _parse_measurements(self):
         m_dict = {}
         for f in self.fields:
             m_dict[f] = Measurement(
@@ -83,9 +477,9 @@ class ObservationData:
 
 
 class DailyObservationData(ObservationData):
+    __slots__ = ()
 
-    @property
-    def measurements(self):
+    def _parse_measurements(self):
         m_dict = {}
         for f in self.fields:
             field_json = self.raw_json[f]
@@ -95,7 +489,7 @@ class DailyObservationData(ObservationData):
                     key = 'max' if 'max' in min_max else 'min'
                     value = min_max[key].get('value', None)
                     units = min_max[key].get('units', None)
-                    time = dateutil.parser.parse(min_max['observation_time'])
+                    time = parse_time(min_max['observation_time'])
                     m_dict[f][key] = Measurement(value, units, time)
             else:
                 m_dict[f] = Measurement(
@@ -105,18 +499,127 @@ class DailyObservationData(ObservationData):
 
 
 class FireIndexData:
+    __slots__ = ('raw_json', '_fire_index')
 
     def __init__(self, raw_json):
         self.raw_json = raw_json
 
     @property
     def fire_index(self):
+        if self.raw_json is None:
+            return self._fire_index
         return self.raw_json[0].get('fire_index', None)
 
+    def drop_raw_json(self):
+        if self.raw_json is not None:
+            self._fire_index = self.fire_index
+            self.raw_json = None
+        return self
+
 
 class Measurement:
+    __slots__ = ('value', 'units', 'observation_time')
 
     def __init__(self, value, units, observation_time=None):
         self.value = value
         self.units = units
         self.observation_time = observation_time
+
+
+class ColumnarData:
+    """
+    Column oriented data of a list response. observation_time is an
+    array('q') of microseconds since the Unix epoch in UTC, see datetimes()
+    for datetime objects, and values maps every field to one value per
+    timestep: an array('d') with NaN for missing values when the field is
+    numeric, a list otherwise. units maps fields to their units.
+
+    Daily min/max fields are split into '<field>.min' and '<field>.max'
+    columns.
+    """
+
+    __slots__ = ('observation_time', 'values', 'units')
+
+    def __init__(self, observation_time, values, units):
+        self.observation_time = observation_time
+        self.values = values
+        self.units = units
+
+    def __len__(self):
+        return len(self.observation_time)
+
+    @classmethod
+    def from_json(cls, raw_json, fields):
+        observation_time = array('q')
+        columns = {}
+        units = {}
+        for row, o_json in enumerate(raw_json):
+            observation_time.append(
+                    parse_epoch_us(o_json['observation_time']['value']))
+            for f in fields:
+                field_json = o_json.get(f)
+                if field_json is None:
+                    continue
+                if isinstance(field_json, list):
+                    items = [('{}.{}'.format(f, key), min_max[key])
+                             for min_max in field_json
+                             for key in ('min', 'max') if key in min_max]
+                else:
+                    items = [(f, field_json)]
+
+                for name, value_json in items:
+                    column = columns.get(name)
+                    if column is None:
+                        column = columns[name] = [None] * len(raw_json)
+                    column[row] = value_json.get('value')
+                    if name not in units and 'units' in value_json:
+                        units[name] = value_json['units']
+
+        values = {name: cls._compact(column)
+                  for name, column in columns.items()}
+        return cls(observation_time, values, units)
+
+    @staticmethod
+    def _compact(column):
+        numeric = all(v is None or (isinstance(v, (int, float))
+                                    and not isinstance(v, bool))
+                      for v in column)
+        if not numeric:
+            return column
+        nan = float('nan')
+        return array('d', [nan if v is None else v for v in column])
+
+    def datetimes(self):
+        """
+        :returns: observation_time as timezone aware UTC datetimes
+        :rtype: list
+        """
+
+        return [_EPOCH + timedelta(microseconds=t)
+                for t in self.observation_time]
+
+    def to_numpy(self):
+        """
+        Convert the columns to numpy arrays. observation_time becomes a
+        datetime64[us] array in UTC, numeric fields float64 arrays and other
+        fields object arrays.
+
+        :returns: Dictionary of numpy arrays keyed by column name
+        :rtype: dict
+        """
+
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError(
+                    "to_numpy() requires numpy, install it with: "
+                    "pip install climacell-python[numpy]")
+
+        arrays = {'observation_time': np.frombuffer(
+            self.observation_time, dtype=np.int64).astype('datetime64[us]')}
+        for name, column in self.values.items():
+            if isinstance(column, array):
+                arrays[name] = np.frombuffer(column, dtype=np.float64).copy()
+            else:
+                arrays[name] = np.array(column, dtype=object)
+        return arrays
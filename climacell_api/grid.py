@@ -0,0 +1,159 @@
+import math
+from array import array
+
+from climacell_api.climacell_response import ErrorData
+
+ENDPOINTS = ('realtime', 'nowcast', 'forecast_hourly', 'forecast_daily')
+
+
+def grid_axes(bbox, resolution):
+    """
+    Latitudes and longitudes of the points covering a bounding box, from
+    its south west corner in steps of resolution degrees.
+
+    :param tuple bbox: (min_lat, min_lon, max_lat, max_lon)
+    :param float resolution: Spacing of the points in degrees
+
+    :returns: (lats, lons) lists, both ascending
+    :rtype: tuple
+    """
+
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if resolution <= 0:
+        raise ValueError("resolution must be positive")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("bbox must be (min_lat, min_lon, max_lat, max_lon)")
+
+    def axis(start, stop):
+        # The epsilon keeps stop when it is a whole number of steps away
+        count = int(math.floor((stop - start) / resolution + 1e-9)) + 1
+        return [round(start + i * resolution, 10) for i in range(count)]
+
+    return axis(min_lat, max_lat), axis(min_lon, max_lon)
+
+
+class GridData:
+    """
+    Dense gridded result of fetch_grid. values is a float64 numpy array of
+    shape (time, lat, lon, field), NaN where a location has no value for a
+    time, with the time (datetime64[us] in UTC), lat, lon and fields axes
+    alongside. errors maps the (lat, lon) of every location that failed to
+    its ErrorData; those locations are all NaN.
+    """
+
+    __slots__ = ('values', 'time', 'lat', 'lon', 'fields', 'units', 'errors')
+
+    def __init__(self, values, time, lat, lon, fields, units, errors):
+        self.values = values
+        self.time = time
+        self.lat = lat
+        self.lon = lon
+        self.fields = fields
+        self.units = units
+        self.errors = errors
+
+    def field(self, name):
+        """
+        :param string name: Field name, e.g. 'temp' or 'temp.min'
+
+        :returns: (time, lat, lon) array of the field
+        :rtype: numpy.ndarray
+        """
+
+        return self.values[..., self.fields.index(name)]
+
+
+def fetch_grid(client, bbox, resolution, fields, endpoint='forecast_hourly',
+               max_workers=10, parser=None, **kwargs):
+    """
+    Fetch an endpoint for every point of a grid over a bounding box and
+    assemble the numeric fields into one dense array. The points are
+    requested concurrently through the client's *_many method, and parsed
+    with ClimacellResponse.to_columns(), so no ObservationData is built.
+
+    Non numeric fields, such as precipitation_type, are left out. Daily min
+    and max values become 'temp.min' and 'temp.max' fields.
+
+    :param ClimacellApiClient client: Client used to fetch data
+    :param tuple bbox: (min_lat, min_lon, max_lat, max_lon)
+    :param float resolution: Spacing of the grid in degrees
+    :param list fields: List of data fields to pull
+    :param string endpoint: 'realtime', 'nowcast', 'forecast_hourly' or
+    'forecast_daily'
+    :param int max_workers: Maximum number of requests in flight
+    :param ProcessPoolParser parser: Optional parser to parse the responses
+    in worker processes
+    :param kwargs: Other arguments of the endpoint, e.g. timestep, start_time,
+    end_time and units
+
+    :returns: The gridded data
+    :rtype: GridData
+    """
+
+    np = _numpy()
+    if endpoint not in ENDPOINTS:
+        raise ValueError("endpoint must be one of {}".format(
+                ", ".join(ENDPOINTS)))
+
+    lats, lons = grid_axes(bbox, resolution)
+    fetch_many = getattr(client, endpoint + '_many')
+    results = list(fetch_many([(lat, lon) for lat in lats for lon in lons],
+                              fields=fields, max_workers=max_workers,
+                              **kwargs))
+    if parser is not None:
+        parsed = parser.map(results)
+    else:
+        parsed = (result.error if result.error is not None
+                  else result.response.to_columns() for result in results)
+
+    errors = {}
+    located = []
+    for result, columns in zip(results, parsed):
+        if isinstance(columns, ErrorData):
+            errors[result.location] = columns
+        else:
+            located.append((result.location, columns))
+
+    numeric = set()
+    units = {}
+    times = set()
+    for _, columns in located:
+        numeric.update(name for name, column in columns.values.items()
+                       if isinstance(column, array))
+        units.update(columns.units)
+        times.update(columns.observation_time)
+    names = [name for f in fields
+             for name in (f, f + '.min', f + '.max') if name in numeric]
+    time_axis = sorted(times)
+
+    values = np.full((len(time_axis), len(lats), len(lons), len(names)),
+                     np.nan)
+    time_index = {t: k for k, t in enumerate(time_axis)}
+    lat_index = {lat: i for i, lat in enumerate(lats)}
+    lon_index = {lon: j for j, lon in enumerate(lons)}
+    for (lat, lon), columns in located:
+        rows = np.fromiter((time_index[t] for t in columns.observation_time),
+                           dtype=np.intp, count=len(columns))
+        cell = values[:, lat_index[lat], lon_index[lon]]
+        for k, name in enumerate(names):
+            column = columns.values.get(name)
+            if isinstance(column, array):
+                cell[rows, k] = np.frombuffer(column, dtype=np.float64)
+
+    return GridData(
+            values=values,
+            time=np.array(time_axis, dtype=np.int64).astype(
+                    'datetime64[us]'),
+            lat=np.array(lats), lon=np.array(lons), fields=names,
+            units={name: units[name] for name in names if name in units},
+            errors=errors)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+                "fetch_grid() requires numpy, install it with: "
+                "pip install climacell-python[numpy]")
+    return numpy
@@ -0,0 +1,62 @@
+import importlib
+
+# Decoders tried in order when picking one automatically. 'json' is the
+# standard library, decoding through requests' Response.json().
+BACKENDS = ('orjson', 'simdjson', 'ujson', 'json')
+
+name = None
+_loads = None
+
+
+def use(backend=None):
+    """
+    Select the json decoder used for response bodies.
+
+    :param string backend: One of BACKENDS, or None to pick the first one
+    that is installed
+
+    :returns: Name of the selected backend
+    :rtype: string
+    """
+
+    global name, _loads
+
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError("backend must be one of {}".format(
+                ", ".join(BACKENDS)))
+    for candidate in BACKENDS if backend is None else (backend,):
+        if candidate == 'json':
+            name, _loads = candidate, None
+            return name
+        try:
+            module = importlib.import_module(candidate)
+        except ImportError:
+            if backend is not None:
+                raise ImportError(
+                        "The {0} json backend requires {0}: pip install "
+                        "{0}".format(candidate))
+            continue
+        name, _loads = candidate, module.loads
+        return name
+
+
+def decode(response):
+    """
+    Decode the json body of a requests response with the selected backend.
+    Bodies the backend cannot decode are handed to Response.json(), so
+    errors and unusual encodings behave exactly as with requests.
+
+    :param requests.Response response: Response with a json body
+
+    :returns: The decoded body
+    """
+
+    if _loads is not None:
+        try:
+            return _loads(response.content)
+        except ValueError:
+            pass
+    return response.json()
+
+
+use()
@@ -0,0 +1,239 @@
+import bisect
+import threading
+from collections import defaultdict
+
+# Upper bounds in seconds of the latency histogram buckets, roughly
+# logarithmic from 0.1ms to 60s. Values above the last bound are counted in
+# an overflow bucket.
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+
+
+class RequestEvent:
+    """
+    One request made through the client, reported to Instrument.on_request.
+
+    cache is 'hit' when the response came from the cache or store, 'stale'
+    when it was served from there after expiring, 'nearest' when it came
+    from a nearby location in the spatial index, 'miss' when it was
+    requested upstream (or shared with a concurrent identical request) and
+    'bypass' for streamed requests. total is the
+    seconds spent in the client, ttfb the seconds from sending the request
+    to receiving the response headers, which includes connecting when no
+    pooled connection was free. ttfb is None for responses that were not
+    requested upstream and for failed requests.
+    bytes is the size of the decoded body and wire_bytes, set on misses
+    only, its size as received before gzip, br or zstd decoding.
+    """
+
+    __slots__ = ('endpoint', 'cache', 'status_code', 'total', 'ttfb',
+                 'bytes', 'wire_bytes', 'error')
+
+    def __init__(self, endpoint, cache, status_code=None, total=None,
+                 ttfb=None, bytes=None, wire_bytes=None, error=None):
+        self.endpoint = endpoint
+        self.cache = cache
+        self.status_code = status_code
+        self.total = total
+        self.ttfb = ttfb
+        self.bytes = bytes
+        self.wire_bytes = wire_bytes
+        self.error = error
+
+
+class ParseEvent:
+    """
+    One call of ClimacellResponse.data() or to_columns(), reported to
+    Instrument.on_parse with the seconds it took and the number of
+    observations parsed.
+    """
+
+    __slots__ = ('endpoint', 'method', 'duration', 'observations')
+
+    def __init__(self, endpoint, method, duration, observations):
+        self.endpoint = endpoint
+        self.method = method
+        self.duration = duration
+        self.observations = observations
+
+
+class Instrument:
+    """
+    Interface for instrumentation hooks passed to the client. Hooks run on
+    the thread (or event loop) that made the request, so they should be
+    quick and must not raise.
+    """
+
+    def on_request(self, event):
+        """:param RequestEvent event: The request that finished"""
+
+    def on_parse(self, event):
+        """:param ParseEvent event: The parse that finished"""
+
+
+class _Histogram:
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class HistogramCollector(Instrument):
+    """
+    Keeps fixed bucket histograms of request latency, time to first byte
+    and parse time per endpoint, plus counts of cache outcomes, decoded
+    bytes and bytes received on the wire. Recording a value is a bisect and
+    a few additions, so it is cheap enough to leave on in production.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param tuple buckets: Ascending upper bounds of the buckets in
+        seconds
+        """
+
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def on_request(self, event):
+        with self._lock:
+            self._counters[(event.endpoint, 'cache.' + event.cache)] += 1
+            if event.bytes is not None:
+                self._counters[(event.endpoint, 'bytes')] += event.bytes
+            if event.wire_bytes is not None:
+                self._counters[(event.endpoint, 'wire_bytes')] += (
+                        event.wire_bytes)
+            if event.error is not None:
+                self._counters[(event.endpoint, 'errors')] += 1
+            self._record(event.endpoint, 'total', event.total)
+            if event.ttfb is not None:
+                self._record(event.endpoint, 'ttfb', event.ttfb)
+
+    def on_parse(self, event):
+        with self._lock:
+            self._record(event.endpoint, 'parse.' + event.method,
+                         event.duration)
+
+    def percentile(self, endpoint, metric, q):
+        """
+        Estimate of a percentile, as the upper bound of the bucket it falls
+        in.
+
+        :param string endpoint: Endpoint path, e.g. '/weather/realtime'
+        :param string metric: 'total', 'ttfb', 'parse.data' or
+        'parse.to_columns'
+        :param float q: Percentile between 0 and 100
+
+        :returns: Seconds, inf when it falls in the overflow bucket, None
+        when nothing was recorded
+        :rtype: float
+        """
+
+        with self._lock:
+            histogram = self._histograms.get((endpoint, metric))
+            if histogram is None or not histogram.count:
+                return None
+            rank = q / 100.0 * histogram.count
+            seen = 0
+            for i, count in enumerate(histogram.counts):
+                seen += count
+                if count and seen >= rank:
+                    break
+        return self.buckets[i] if i < len(self.buckets) else float('inf')
+
+    def snapshot(self):
+        """
+        Everything recorded so far, e.g. to export as json.
+
+        :returns: Per endpoint dictionary of counters and of histograms with
+        their bucket counts, count and sum
+        :rtype: dict
+        """
+
+        result = defaultdict(dict)
+        with self._lock:
+            for (endpoint, name), value in self._counters.items():
+                result[endpoint][name] = value
+            for (endpoint, name), histogram in self._histograms.items():
+                result[endpoint][name] = {
+                    'buckets': list(self.buckets),
+                    'counts': list(histogram.counts),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                }
+        return dict(result)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _record(self, endpoint, metric, value):
+        histogram = self._histograms.get((endpoint, metric))
+        if histogram is None:
+            histogram = _Histogram(len(self.buckets) + 1)
+            self._histograms[(endpoint, metric)] = histogram
+        histogram.counts[bisect.bisect_left(self.buckets, value)] += 1
+        histogram.count += 1
+        histogram.sum += value
+
+
+class OpenTelemetryInstrument(Instrument):
+    """
+    Records the events on OpenTelemetry instruments created from a meter,
+    with the endpoint, cache outcome and status code as attributes:
+
+        from opentelemetry import metrics
+        instrument = OpenTelemetryInstrument(metrics.get_meter('climacell'))
+        client = ClimacellApiClient(key, instruments=[instrument])
+
+    Only the meter's create_histogram and create_counter methods are used,
+    so this module does not import opentelemetry itself.
+    """
+
+    def __init__(self, meter, prefix='climacell.client'):
+        """
+        :param meter: opentelemetry.metrics.Meter to create instruments on
+        :param string prefix: Prefix of the instrument names
+        """
+
+        self.duration = meter.create_histogram(
+                prefix + '.request.duration', unit='s',
+                description='Time spent in the client per request')
+        self.ttfb = meter.create_histogram(
+                prefix + '.request.ttfb', unit='s',
+                description='Time to the response headers')
+        self.bytes = meter.create_counter(
+                prefix + '.response.bytes', unit='By',
+                description='Decoded response body bytes')
+        self.wire_bytes = meter.create_counter(
+                prefix + '.response.wire_bytes', unit='By',
+                description='Response body bytes received upstream')
+        self.parse = meter.create_histogram(
+                prefix + '.parse.duration', unit='s',
+                description='Time spent parsing responses')
+
+    def on_request(self, event):
+        attributes = {'endpoint': event.endpoint, 'cache': event.cache}
+        if event.status_code is not None:
+            attributes['status_code'] = event.status_code
+        if event.error is not None:
+            attributes['error'] = event.error
+        self.duration.record(event.total, attributes=attributes)
+        if event.ttfb is not None:
+            self.ttfb.record(event.ttfb, attributes=attributes)
+        if event.bytes is not None:
+            self.bytes.add(event.bytes, attributes=attributes)
+        if event.wire_bytes is not None:
+            self.wire_bytes.add(event.wire_bytes, attributes=attributes)
+
+    def on_parse(self, event):
+        self.parse.record(event.duration, attributes={
+            'endpoint': event.endpoint, 'method': event.method})
@@ -0,0 +1,131 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from climacell_api.climacell_response import (ClimacellResponse,
+                                              LocationResult)
+from climacell_api.transport import build_response
+
+
+def parse_columns(content, status_code, fields, response_type='forecast'):
+    """
+    Parse a raw response body to columns. Runs in the worker processes of
+    ProcessPoolParser, but can be called directly too.
+
+    :param bytes content: Raw response body
+    :param int status_code: HTTP status code of the response
+    :param list fields: List of data fields to pull
+    :param string response_type: ClimacellResponse response_type
+
+    :returns: ColumnarData, or ErrorData for error responses
+    :rtype: ColumnarData
+    """
+
+    response = build_response(status_code, {}, content, None)
+    return ClimacellResponse(response, fields,
+                             response_type=response_type).to_columns()
+
+
+def _parse_chunk(calls):
+    return [parse_columns(*call) for call in calls]
+
+
+class ProcessPoolParser:
+    """
+    Parses many responses to ColumnarData in a pool of worker processes, so
+    parsing is not bound to the GIL of the process that fetched them. Only
+    the raw bodies are sent to the workers, and only the compact columns
+    (an array of epoch microseconds for the times, arrays of floats for
+    numeric fields) come back, never one Python object per observation.
+
+        with ProcessPoolParser() as parser:
+            for columns in parser.map(client.forecast_hourly_many(...)):
+                ...
+    """
+
+    def __init__(self, max_workers=None, executor=None):
+        """
+        :param int max_workers: Number of worker processes, defaults to the
+        number of CPUs
+        :param concurrent.futures.Executor executor: Optional executor to
+        submit to instead of starting a pool. The caller owns it
+        """
+
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        self.executor = executor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut down the worker processes, unless the executor was given."""
+
+        if self._owns_executor:
+            self.executor.shutdown()
+
+    def submit(self, response):
+        """
+        :param ClimacellResponse response: Response to parse
+
+        :returns: Future resolving to its ColumnarData, or ErrorData
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.executor.submit(*self._call(response))
+
+    def map(self, responses, chunksize=1):
+        """
+        Parse responses in the order given. LocationResults, as returned by
+        the client's *_many methods, are accepted too, and give their error
+        when they have no response. Responses are sent to the workers as
+        they are read, so parsing overlaps with fetching the rest.
+
+        :param iterable responses: ClimacellResponses or LocationResults
+        :param int chunksize: Responses sent to a worker at a time, raise it
+        for many small responses
+
+        :returns: ColumnarData or ErrorData per response
+        :rtype: iterator
+        """
+
+        # Holds, in order, futures of chunks and lists of errors
+        pending = deque()
+        calls = []
+        for response in responses:
+            if isinstance(response, LocationResult):
+                if response.error is not None:
+                    if calls:
+                        pending.append(self._submit_chunk(calls))
+                        calls = []
+                    pending.append([response.error])
+                    continue
+                response = response.response
+            calls.append(self._call(response)[1:])
+            if len(calls) >= chunksize:
+                pending.append(self._submit_chunk(calls))
+                calls = []
+            while pending and (isinstance(pending[0], list)
+                               or pending[0].done()):
+                for parsed in self._results(pending.popleft()):
+                    yield parsed
+        if calls:
+            pending.append(self._submit_chunk(calls))
+        while pending:
+            for parsed in self._results(pending.popleft()):
+                yield parsed
+
+    def _submit_chunk(self, calls):
+        return self.executor.submit(_parse_chunk, calls)
+
+    @staticmethod
+    def _results(item):
+        return item if isinstance(item, list) else item.result()
+
+    @staticmethod
+    def _call(response):
+        return (parse_columns, response.content, response.status_code,
+                response.fields, response.response_type)
@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# Lower values are served first when requests queue up for a token
+DEFAULT_PRIORITIES = {
+    "/weather/realtime": 0,
+    "/weather/nowcast": 1,
+    "/weather/forecast/hourly": 1,
+    "/weather/forecast/daily": 1,
+    "/insights/fire-index": 1,
+    "/weather/historical/climacell": 2,
+    "/weather/historical/station": 2,
+}
+
+
+def _consume(state, limits, now):
+    # Takes one token from every bucket, or from none of them. Returns 0 on
+    # success, otherwise the seconds until every bucket has a token again.
+    levels = {}
+    wait = 0.0
+    for name, capacity, period in limits:
+        tokens, updated = state.get(name, (capacity, now))
+        rate = capacity / period
+        tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+        levels[name] = tokens
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / rate)
+
+    if wait > 0:
+        return wait
+    for name, tokens in levels.items():
+        state[name] = [tokens - 1, now]
+    return 0.0
+
+
+class MemoryBucketStore:
+    """
+    Token bucket state kept in memory, shared by the threads and tasks of one
+    process.
+    """
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def try_consume(self, limits, now):
+        with self._lock:
+            return _consume(self._state, limits, now)
+
+
+class FileBucketStore:
+    """
+    Token bucket state kept in a json file and updated under an exclusive
+    file lock, so every process on the host using the same path shares one
+    quota.
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError("FileBucketStore needs fcntl file locking")
+        self.path = path
+
+    def try_consume(self, limits, now):
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                state = json.loads(content) if content else {}
+                wait = _consume(state, limits, now)
+                if wait == 0:
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """
+    Client side token bucket limiter with one bucket per configured window.
+    A request needs a token from every bucket. Waiting requests are served
+    by priority (lower first), then in arrival order, across both threads
+    and asyncio tasks.
+    """
+
+    # How often a waiter that is not first in line checks again
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, per_second=None, per_minute=None, per_hour=None,
+                 per_day=None, store=None, priorities=None):
+        """
+        :param float per_second: Requests allowed per second
+        :param float per_minute: Requests allowed per minute
+        :param float per_hour: Requests allowed per hour
+        :param float per_day: Requests allowed per day
+        :param store: Where bucket state lives, MemoryBucketStore by default
+        or FileBucketStore to share the quota between processes
+        :param dict priorities: Priority per endpoint path, overriding
+        DEFAULT_PRIORITIES
+        """
+
+        self.limits = [(name, float(capacity), period)
+                       for name, capacity, period in (
+                           ("second", per_second, 1),
+                           ("minute", per_minute, 60),
+                           ("hour", per_hour, 60 * 60),
+                           ("day", per_day, 24 * 60 * 60))
+                       if capacity is not None]
+        self.store = store if store is not None else MemoryBucketStore()
+        self.priorities = dict(DEFAULT_PRIORITIES)
+        if priorities is not None:
+            self.priorities.update(priorities)
+        self._cond = threading.Condition(threading.RLock())
+        self._waiters = []
+        self._order = itertools.count()
+
+    def priority(self, url_suffix):
+        return self.priorities.get(url_suffix, 1)
+
+    def acquire(self, priority=1, timeout=None):
+        """
+        Block until a request may be sent.
+
+        :param int priority: Lower values are served first
+        :param float timeout: Give up after this many seconds
+
+        :returns: True once a token was taken, False on timeout
+        :rtype: bool
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiter = self._enqueue(priority)
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_acquire(waiter)
+                    if wait == 0:
+                        return True
+                    if wait is None:
+                        wait = self.POLL_INTERVAL
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+        finally:
+            self._dequeue(waiter)
+
+    async def acquire_async(self, priority=1):
+        """
+        Wait, without blocking the event loop, until a request may be sent.
+
+        :param int priority: Lower values are served first
+        """
+
+        waiter = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_acquire(waiter)
+                if wait == 0:
+                    return True
+                await asyncio.sleep(
+                        self.POLL_INTERVAL if wait is None else wait)
+        finally:
+            self._dequeue(waiter)
+
+    def _enqueue(self, priority):
+        waiter = (priority, next(self._order))
+        with self._cond:
+            heapq.heappush(self._waiters, waiter)
+            self._cond.notify_all()
+        return waiter
+
+    def _dequeue(self, waiter):
+        with self._cond:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            self._cond.notify_all()
+
+    def _try_acquire(self, waiter):
+        # 0 when a token was taken, the seconds to wait when first in line
+        # but out of tokens, None when another waiter goes first.
+        with self._cond:
+            if self._waiters[0] != waiter:
+                return None
+            return self.store.try_consume(self.limits, time.time())
@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# (connect, read) timeout in seconds used when none is given to the client
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a failed request.
+
+    Connection errors, timeouts and responses with a status in
+    retry_statuses are retried up to max_attempts attempts in total. The
+    wait doubles with every attempt starting at backoff_factor seconds, up
+    to max_backoff, and is randomized between zero and that value when
+    jitter is on. A Retry-After header on the response takes precedence,
+    unless it asks to wait more than max_retry_after seconds (max_backoff by
+    default), in which case the response is returned instead of tying up
+    the caller. No retry is made that would end after deadline seconds
+    since the first attempt started.
+    """
+
+    def __init__(self, max_attempts=3, backoff_factor=0.5, max_backoff=30,
+                 jitter=True, retry_statuses=(429, 500, 502, 503, 504),
+                 deadline=None, max_retry_after=None):
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.deadline = deadline
+        self.max_retry_after = (max_backoff if max_retry_after is None
+                                else max_retry_after)
+
+    def next_delay(self, attempt, elapsed, response=None, exception=None):
+        """
+        :param int attempt: Number of attempts made so far
+        :param float elapsed: Seconds since the first attempt started
+        :param requests.Response response: Response of the last attempt
+        :param Exception exception: Exception raised by the last attempt
+
+        :returns: Seconds to wait before the next attempt, or None to stop
+        :rtype: float
+        """
+
+        if attempt >= self.max_attempts:
+            return None
+        if exception is None and (
+                response.status_code not in self.retry_statuses):
+            return None
+
+        delay = retry_after(response) if response is not None else None
+        if delay is not None and delay > self.max_retry_after:
+            return None
+        if delay is None:
+            delay = min(self.max_backoff,
+                        self.backoff_factor * 2 ** (attempt - 1))
+            if self.jitter:
+                delay = random.uniform(0, delay)
+
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+    def remaining(self, elapsed):
+        """Seconds left of the deadline, None when there is no deadline."""
+
+        if self.deadline is None:
+            return None
+        return max(self.deadline - elapsed, 0)
+
+
+def retry_after(response):
+    """
+    Seconds to wait according to the response's Retry-After header.
+
+    :param requests.Response response: Response to inspect
+
+    :returns: Seconds to wait, or None when there is no usable header
+    :rtype: float
+    """
+
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(when.timestamp() - time.time(), 0)
+
+
+class CircuitBreaker:
+    """
+    Fails fast when upstream looks down. After failure_threshold consecutive
+    failures (connection errors, timeouts or 5xx responses) the circuit opens
+    and requests raise CircuitOpenError without being sent. After
+    reset_timeout seconds one trial request is let through: the circuit
+    closes again if it succeeds and reopens if it fails.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_request(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return
+        raise CircuitOpenError(
+                "Circuit breaker is open after {} consecutive failures".format(
+                    self.failures))
+
+    def record(self, response=None, exception=None):
+        failed = exception is not None or response.status_code >= 500
+        with self._lock:
+            self._trial = False
+            if not failed:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
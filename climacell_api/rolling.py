@@ -0,0 +1,161 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from climacell_api.climacell_response import ClimacellResponse, parse_time
+
+
+class RollingForecast:
+    """
+    Keeps the latest nowcast or hourly forecast series per location and
+    refreshes it incrementally. Each get() drops the observations that are
+    in the past and only requests the part of the horizon that is not stored
+    yet, then merges it into the stored series.
+
+    Stored observations are not re-requested until max_age has passed since
+    the last full refresh, at which point the whole horizon is fetched again.
+    """
+
+    ENDPOINTS = ('nowcast', 'forecast_hourly')
+
+    def __init__(self, client, fields, endpoint='forecast_hourly',
+                 horizon=timedelta(hours=96), timestep=None, units='si',
+                 max_age=timedelta(hours=1)):
+        """
+        :param ClimacellApiClient client: Client used to fetch data
+        :param list fields: List of data fields to pull
+        :param string endpoint: Either 'nowcast' or 'forecast_hourly'
+        :param timedelta horizon: How far ahead the series should reach
+        :param int timestep: Minutes between forecasts, required for nowcast
+        :param string units: Either scientific ('si') or US ('us')
+        :param timedelta max_age: Refetch the whole horizon once the last
+        full refresh is older than this, None to never do so
+        """
+
+        if endpoint not in self.ENDPOINTS:
+            raise ValueError("endpoint must be one of {}".format(
+                    ", ".join(self.ENDPOINTS)))
+        if endpoint == 'nowcast' and timestep is None:
+            raise ValueError("timestep is required for nowcast")
+
+        self.client = client
+        self.fields = fields
+        self.endpoint = endpoint
+        self.horizon = horizon
+        self.timestep = timestep
+        self.units = units
+        self.max_age = max_age
+        if endpoint == 'nowcast':
+            self.step = timedelta(minutes=timestep)
+        else:
+            self.step = timedelta(hours=1)
+        self.stats = {"full": 0, "incremental": 0, "unchanged": 0}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def get(self, lat, lon, now=None):
+        """
+        Forecast for a location from now until now + horizon.
+
+        :param float lat: Latitude of location
+        :param float lon: Longitude of location
+        :param datetime now: Current time, defaults to the clock
+
+        :returns: Response with the merged series, or the error response of
+        the request that failed
+        :rtype: ClimacellResponse
+        """
+
+        now = now or datetime.now(timezone.utc)
+        end_time = now + self.horizon
+        with self._lock:
+            series = self._series.get((lat, lon))
+
+        if series is None or (self.max_age is not None
+                              and now - series.refreshed_at > self.max_age):
+            start_time = now
+            observations = []
+            refreshed_at = now
+            stat = "full"
+        else:
+            # Keep the observation covering now, drop the ones before it
+            observations = [o for o in series.observations
+                            if o[0] > now - self.step]
+            start_time = observations[-1][0] if observations else now
+            refreshed_at = series.refreshed_at
+            stat = "incremental"
+
+        if start_time + self.step <= end_time or not observations:
+            response = self._fetch(lat, lon, start_time, end_time)
+            if response.status_code != 200:
+                return response
+            observations = self._merge(observations, response.json())
+        else:
+            stat = "unchanged"
+
+        with self._lock:
+            self._series[(lat, lon)] = _Series(observations, refreshed_at)
+            self.stats[stat] += 1
+        return self._response(observations)
+
+    def forget(self, lat, lon):
+        """Drop the stored series of a location."""
+
+        with self._lock:
+            self._series.pop((lat, lon), None)
+
+    def _fetch(self, lat, lon, start_time, end_time):
+        kwargs = dict(lat=lat, lon=lon, fields=self.fields,
+                      start_time=start_time.isoformat(),
+                      end_time=end_time.isoformat(), units=self.units)
+        if self.endpoint == 'nowcast':
+            return self.client.nowcast(timestep=self.timestep, **kwargs)
+        return self.client.forecast_hourly(**kwargs)
+
+    @staticmethod
+    def _merge(observations, new_json):
+        # Newly fetched observations replace stored ones for the same time
+        merged = {o[0]: o for o in observations}
+        for o_json in new_json:
+            time = parse_time(o_json['observation_time']['value'])
+            merged[time] = (time, o_json)
+        return [merged[time] for time in sorted(merged)]
+
+    def _response(self, observations):
+        series = [o[1] for o in observations]
+        return ClimacellResponse.from_json(_SeriesResponse(series), series,
+                                           self.fields)
+
+
+class _SeriesResponse(requests.Response):
+    # Response around a merged series whose body is only encoded if read
+
+    def __init__(self, series):
+        super().__init__()
+        self.status_code = 200
+        self.reason = 'OK'
+        self.headers = CaseInsensitiveDict(
+                {'Content-Type': 'application/json; charset=utf-8'})
+        self.encoding = 'utf-8'
+        self._series = series
+
+    @property
+    def content(self):
+        if self._content is False:
+            self._content = json.dumps(self._series).encode('utf-8')
+            self._content_consumed = True
+        return self._content
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        self.content
+        return super().iter_content(chunk_size, decode_unicode)
+
+
+class _Series:
+
+    def __init__(self, observations, refreshed_at):
+        self.observations = observations
+        self.refreshed_at = refreshed_at
@@ -0,0 +1,250 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Endpoint method names the scheduler can refresh, with their paths
+ENDPOINTS = {
+    'realtime': '/weather/realtime',
+    'nowcast': '/weather/nowcast',
+    'forecast_hourly': '/weather/forecast/hourly',
+    'forecast_daily': '/weather/forecast/daily',
+}
+
+# Fractional part of the golden ratio. Multiples of it modulo 1 stay evenly
+# spread however many there are.
+_GOLDEN = 0.6180339887498949
+
+
+class _Job:
+
+    def __init__(self, endpoint, lat, lon, kwargs, period, phase):
+        self.endpoint = endpoint
+        self.lat = lat
+        self.lon = lon
+        self.kwargs = kwargs
+        self.period = period
+        self.phase = phase
+        self.subscriptions = []
+        self.fields = []
+        self.due = None
+        self.active = True
+
+
+class PrefetchScheduler:
+    """
+    Keeps the client's cache warm for a registry of periodic requests.
+
+    Every subscription is refreshed lead seconds before its cached response
+    expires, or every interval seconds if that is shorter. Subscriptions to
+    the same endpoint and location are refreshed with one request, for the
+    union of their fields when the client merges fields. Refreshes are
+    spread evenly over the period, so the requests of many subscriptions do
+    not fire all at once. A new subscription is fetched on the next run to
+    warm the cache, then on its slot of the period.
+
+    Call run_pending() from your own loop, or start() a background thread.
+    The client needs a cache, and refreshes bypass it to go upstream.
+    """
+
+    def __init__(self, client, lead=5, max_workers=4):
+        """
+        :param ClimacellApiClient client: Client whose cache to keep warm
+        :param float lead: Seconds before expiry to refresh responses
+        :param int max_workers: Maximum number of refreshes in flight
+        """
+
+        if client.cache is None:
+            raise ValueError("PrefetchScheduler needs a client with a cache")
+        self.client = client
+        self.lead = lead
+        self.max_workers = max_workers
+        self.stats = {"refreshes": 0, "errors": 0}
+        self._jobs = {}
+        self._queue = []
+        self._order = itertools.count()
+        self._phases = itertools.count()
+        self._epoch = time.time()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def subscribe(self, lat, lon, endpoint, fields, interval=None, **kwargs):
+        """
+        Register a periodic request.
+
+        :param float lat: Latitude of location
+        :param float lon: Longitude of location
+        :param string endpoint: 'realtime', 'nowcast', 'forecast_hourly' or
+        'forecast_daily'
+        :param list fields: List of data fields to pull
+        :param float interval: Longest time in seconds the cached response
+        may be kept, defaults to the endpoint's cache ttl
+        :param kwargs: Other arguments of the endpoint, e.g. units, timestep
+        or start_time. They must match those of the calls to be served
+
+        :returns: Handle to pass to unsubscribe()
+        :rtype: tuple
+        """
+
+        ttl = self.client.cache_ttls.get(ENDPOINTS.get(endpoint))
+        if not ttl:
+            raise ValueError("{} is not a cached endpoint".format(endpoint))
+        period = max(min(interval or ttl, ttl) - self.lead, 1)
+        # Locations the client snaps to the same point share one job
+        lat, lon = (float(value) for value in self.client.snap(lat, lon))
+        key = self._job_key(endpoint, lat, lon, fields, kwargs)
+        subscription = (key, next(self._order), tuple(fields), period)
+
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                phase = (next(self._phases) * _GOLDEN) % 1
+                job = self._jobs[key] = _Job(endpoint, lat, lon, kwargs,
+                                             period, phase)
+                job.due = time.time()
+                self._push(job)
+            job.subscriptions.append(subscription)
+            self._update(job, time.time())
+            self._wakeup.notify()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """:param tuple subscription: Handle returned by subscribe()"""
+
+        with self._lock:
+            job = self._jobs.get(subscription[0])
+            if job is None or subscription not in job.subscriptions:
+                return
+            job.subscriptions.remove(subscription)
+            if job.subscriptions:
+                self._update(job, time.time())
+            else:
+                job.active = False
+                del self._jobs[subscription[0]]
+
+    def run_pending(self, now=None):
+        """
+        Refresh every subscription that is due.
+
+        :param float now: Current time, defaults to the clock
+
+        :returns: Number of requests made
+        :rtype: int
+        """
+
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                entry_due, _, job = heapq.heappop(self._queue)
+                if job.active and job.due == entry_due:
+                    due.append(job)
+                    job.due = self._next_run(job, now)
+                    self._push(job)
+
+        if len(due) > 1 and self.max_workers > 1:
+            workers = min(self.max_workers, len(due))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self._refresh, due))
+        else:
+            for job in due:
+                self._refresh(job)
+        return len(due)
+
+    def next_due(self):
+        """Time of the next refresh, None without subscriptions."""
+
+        with self._lock:
+            self._drop_stale()
+            return self._queue[0][0] if self._queue else None
+
+    def start(self):
+        """Refresh subscriptions from a daemon thread until stop()."""
+
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run,
+                                            name='climacell-prefetch')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._wakeup.notify()
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                self._drop_stale()
+                wait = None
+                if self._queue:
+                    wait = max(self._queue[0][0] - time.time(), 0)
+                if wait != 0:
+                    self._wakeup.wait(wait)
+                    continue
+            self.run_pending()
+
+    def _refresh(self, job):
+        method = getattr(self.client, job.endpoint)
+        try:
+            with self.client.refreshing():
+                response = method(lat=job.lat, lon=job.lon,
+                                  fields=list(job.fields), **job.kwargs)
+            failed = response.status_code != 200
+        except Exception:
+            logger.exception("Refreshing %s for %s, %s failed", job.endpoint,
+                             job.lat, job.lon)
+            failed = True
+        with self._lock:
+            self.stats["errors" if failed else "refreshes"] += 1
+
+    def _job_key(self, endpoint, lat, lon, fields, kwargs):
+        key = (endpoint, lat, lon, tuple(sorted(kwargs.items())))
+        if not self.client.merge_fields:
+            # Without merging, a response only serves its exact fields
+            key += (tuple(sorted(fields)),)
+        return key
+
+    def _update(self, job, now):
+        fields = []
+        for subscription in job.subscriptions:
+            fields.extend(f for f in subscription[2] if f not in fields)
+        job.fields = fields
+        job.period = min(subscription[3]
+                         for subscription in job.subscriptions)
+        due = self._next_run(job, now)
+        if due < job.due:
+            job.due = due
+            self._push(job)
+
+    def _next_run(self, job, now):
+        # Runs fall on a fixed grid of the period, offset by the job's phase
+        offset = self._epoch + job.phase * job.period
+        cycles = int((now - offset) // job.period) + 1
+        return offset + cycles * job.period
+
+    def _push(self, job):
+        heapq.heappush(self._queue, (job.due, next(self._order), job))
+
+    def _drop_stale(self):
+        while self._queue and (not self._queue[0][2].active
+                               or self._queue[0][2].due
+                               != self._queue[0][0]):
+            heapq.heappop(self._queue)
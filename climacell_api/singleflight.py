@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+
+class _Call:
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def covers(self, fields):
+        return fields is None or fields <= self.fields
+
+
+def _widen(fields, calls):
+    if fields is None:
+        return None
+    return fields.union(*[call.fields for call in calls])
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the
+    function, callers arriving while it is still running wait for it and get
+    the same result (or exception) instead of running it again.
+
+    When a set of fields is passed, a caller only joins a running call whose
+    fields include its own. Otherwise it starts a new call for the union of
+    its fields and those of the calls already running for the key, and the
+    function is called with that union as the fields keyword argument.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key, fn, *args, fields=None):
+        with self._lock:
+            calls = self._calls.setdefault(key, [])
+            call = next((c for c in calls if c.covers(fields)), None)
+            leader = call is None
+            if leader:
+                call = _Call(_widen(fields, calls))
+                calls.append(call)
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, fields=call.fields)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                calls.remove(call)
+                if not calls:
+                    del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines running on one event loop.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    async def do(self, key, fn, *args, fields=None):
+        calls = self._calls.setdefault(key, [])
+        call = next((c for c in calls if c.covers(fields)), None)
+        if call is not None:
+            self.stats["shared"] += 1
+            # Shield so a cancelled follower does not cancel the leader
+            return await asyncio.shield(call.future)
+
+        self.stats["calls"] += 1
+        call = _Call(_widen(fields, calls))
+        call.future = asyncio.ensure_future(fn(*args, fields=call.fields))
+        calls.append(call)
+
+        def forget(_):
+            calls.remove(call)
+            if not calls and self._calls.get(key) is calls:
+                del self._calls[key]
+
+        call.future.add_done_callback(forget)
+        return await asyncio.shield(call.future)
@@ -0,0 +1,163 @@
+import math
+import threading
+import time
+
+# Mean radius of the earth in kilometers
+EARTH_RADIUS = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance between two points.
+
+    :returns: Distance in kilometers
+    :rtype: float
+    """
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2)
+         * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class _Point:
+
+    __slots__ = ('lat', 'lon', 'stored_at', 'tag', 'item')
+
+    def __init__(self, lat, lon, stored_at, tag, item):
+        self.lat = lat
+        self.lon = lon
+        self.stored_at = stored_at
+        self.tag = tag
+        self.item = item
+
+
+class SpatialIndex:
+    """
+    Grid index of recent observations by location. Points are bucketed in
+    cells of cell_size degrees, so finding the nearest one only looks at
+    the cells within max_distance instead of scanning every point.
+
+    Passed to ClimacellApiClient as spatial_index, realtime requests are
+    answered with the response of the nearest location requested within
+    max_distance kilometers and max_age seconds, if there is one, instead of
+    calling the API. The observation then carries that location's lat and
+    lon.
+    """
+
+    def __init__(self, max_distance=5.0, max_age=120, cell_size=0.1):
+        """
+        :param float max_distance: Kilometers a stored point may be from the
+        requested location
+        :param float max_age: Seconds a stored point is usable
+        :param float cell_size: Size of the grid cells in degrees
+        """
+
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.cell_size = cell_size
+        self._columns = int(round(360 / cell_size))
+        self._cells = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, lat, lon, item, tag=None, stored_at=None):
+        """
+        Store an item at a location. It replaces an item stored at the same
+        location with the same tag.
+
+        :param float lat: Latitude of the item
+        :param float lon: Longitude of the item
+        :param item: Item to store, e.g. a response
+        :param tag: Hashable value nearest() can match on, e.g. the units
+        :param float stored_at: When the item was observed, defaults to now
+        """
+
+        stored_at = time.time() if stored_at is None else stored_at
+        cell = self._cell(lat, lon)
+        with self._lock:
+            points = self._cells.setdefault(cell, {})
+            if (lat, lon, tag) not in points:
+                self._size += 1
+            points[(lat, lon, tag)] = _Point(lat, lon, stored_at, tag, item)
+
+    def nearest(self, lat, lon, match=None, now=None, max_age=None):
+        """
+        The nearest item within max_distance and max_age.
+
+        :param float lat: Latitude of the location
+        :param float lon: Longitude of the location
+        :param function match: Only consider items whose tag it returns
+        True for
+        :param float now: Current time, defaults to the clock
+        :param float max_age: Seconds an item is usable for this lookup,
+        capped at the index's max_age
+
+        :returns: (item, distance in kilometers), or None
+        :rtype: tuple
+        """
+
+        now = time.time() if now is None else now
+        oldest = now - self.max_age
+        usable = oldest if max_age is None else max(oldest, now - max_age)
+        rows = int(math.ceil(
+                self.max_distance / KM_PER_DEGREE / self.cell_size))
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + rows *
+                                                self.cell_size, 90))), 1e-6)
+        columns = min(int(math.ceil(rows / cos_lat)), self._columns // 2)
+        row, column = self._cell(lat, lon)
+
+        best = None
+        best_distance = self.max_distance
+        with self._lock:
+            for i in range(row - rows, row + rows + 1):
+                for j in range(column - columns, column + columns + 1):
+                    points = self._cells.get((i, j % self._columns))
+                    if not points:
+                        continue
+                    for key, point in list(points.items()):
+                        if point.stored_at < oldest:
+                            del points[key]
+                            self._size -= 1
+                            continue
+                        if point.stored_at < usable:
+                            continue
+                        if match is not None and not match(point.tag):
+                            continue
+                        d = distance(lat, lon, point.lat, point.lon)
+                        if d <= best_distance:
+                            best, best_distance = point, d
+        if best is None:
+            return None
+        return best.item, best_distance
+
+    def prune(self, now=None):
+        """
+        Drop every item older than max_age.
+
+        :returns: Number of items dropped
+        :rtype: int
+        """
+
+        oldest = (time.time() if now is None else now) - self.max_age
+        dropped = 0
+        with self._lock:
+            for cell, points in list(self._cells.items()):
+                for key in [key for key, point in points.items()
+                            if point.stored_at < oldest]:
+                    del points[key]
+                    dropped += 1
+                if not points:
+                    del self._cells[cell]
+            self._size -= dropped
+        return dropped
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.cell_size)),
+                int(math.floor(lon / self.cell_size)) % self._columns)
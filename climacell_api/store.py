@@ -0,0 +1,147 @@
+import ast
+import json
+import sqlite3
+import threading
+import time
+
+from climacell_api.cache import CacheEntry
+from climacell_api.transport import (body_headers, build_response,
+                                     strip_apikey)
+
+
+class ResponseStore:
+    """
+    Persistent store of raw successful responses in a SQLite database, keyed
+    on the normalized request. The client reads through it on cache misses
+    and writes every successful response to it, so a restarted service can
+    serve recent responses from disk straight away. With the client in
+    offline mode, stored responses are replayed whatever their age.
+
+    The database uses write-ahead logging, so several processes can share
+    one file.
+    """
+
+    def __init__(self, path):
+        """
+        :param string path: Path of the SQLite database file
+        """
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url_suffix TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    fields TEXT,
+                    status_code INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    url TEXT,
+                    body BLOB NOT NULL
+                )""")
+            self._db.execute("""
+                CREATE INDEX IF NOT EXISTS responses_stored_at
+                ON responses (url_suffix, stored_at)""")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                    "SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get(self, key, ttl):
+        """
+        :param tuple key: Normalized request key
+        :param float ttl: Seconds the response is considered fresh
+
+        :returns: The stored response, or None
+        :rtype: CacheEntry
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                    "SELECT stored_at, fields, status_code, headers, url, body"
+                    " FROM responses WHERE key = ?", (repr(key),)).fetchone()
+        if row is None:
+            return None
+        return self._entry(row, ttl)
+
+    def put(self, key, entry):
+        """
+        :param tuple key: Normalized request key, its first item the endpoint
+        :param CacheEntry entry: Response to store
+        """
+
+        response = entry.response
+        fields = None
+        if entry.fields is not None:
+            fields = ",".join(sorted(entry.fields))
+        headers = json.dumps(body_headers(response.headers))
+        with self._lock:
+            self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, url_suffix,"
+                    " stored_at, fields, status_code, headers, url, body)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (repr(key), key[0], entry.stored_at, fields,
+                     response.status_code, headers,
+                     strip_apikey(response.url), response.content))
+
+    def warm(self, cache, ttls, now=None):
+        """
+        Load every stored response that is still fresh into a cache, e.g. at
+        service start.
+
+        :param CacheBackend cache: Cache to fill
+        :param dict ttls: Seconds responses stay fresh per endpoint path
+        :param float now: Current time, defaults to the clock
+
+        :returns: Number of responses loaded
+        :rtype: int
+        """
+
+        now = time.time() if now is None else now
+        loaded = 0
+        for url_suffix, ttl in ttls.items():
+            if not ttl:
+                continue
+            with self._lock:
+                rows = self._db.execute(
+                        "SELECT key, stored_at, fields, status_code, headers,"
+                        " url, body FROM responses"
+                        " WHERE url_suffix = ? AND stored_at > ?",
+                        (url_suffix, now - ttl)).fetchall()
+            for row in rows:
+                cache.set(ast.literal_eval(row[0]),
+                          self._entry(row[1:], ttl))
+                loaded += 1
+        return loaded
+
+    def prune(self, older_than):
+        """
+        Delete responses stored more than older_than seconds ago.
+
+        :returns: Number of responses deleted
+        :rtype: int
+        """
+
+        with self._lock:
+            cursor = self._db.execute(
+                    "DELETE FROM responses WHERE stored_at < ?",
+                    (time.time() - older_than,))
+        return cursor.rowcount
+
+    @staticmethod
+    def _entry(row, ttl):
+        stored_at, fields, status_code, headers, url, body = row
+        response = build_response(status_code, json.loads(headers),
+                                  bytes(body), url)
+        if fields is not None:
+            fields = frozenset(fields.split(","))
+        return CacheEntry(response, stored_at, ttl, fields)
@@ -0,0 +1,158 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util import request as urllib3_request
+
+# Every content coding urllib3 can decode here: gzip and deflate, plus br
+# when brotli is installed and zstd when zstandard is (urllib3 2 only)
+ACCEPT_ENCODING = ", ".join(urllib3_request.ACCEPT_ENCODING.split(","))
+
+
+def create_session(pool_connections=10, pool_maxsize=10, pool_block=False,
+                   keep_alive=True):
+    """
+    Build a requests session backed by a pooled, keep-alive HTTP adapter.
+
+    :param int pool_connections: Number of per-host pools to keep around
+    :param int pool_maxsize: Maximum connections kept open per host
+    :param bool pool_block: Block when a host has no free connection instead
+    of opening a throwaway one
+    :param bool keep_alive: Reuse connections between requests
+
+    :returns: Session with the pooled adapter mounted for http and https
+    :rtype: requests.Session
+    """
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def pool_stats(session):
+    """
+    Connection pool hit and miss counts for every HTTPAdapter mounted on the
+    session. A miss is a request that had to open a new connection, a hit is
+    one that reused a pooled connection.
+
+    :param requests.Session session: Session to inspect
+
+    :returns: Dictionary with 'requests', 'hits' and 'misses' counts
+    :rtype: dict
+    """
+
+    num_requests = 0
+    num_connections = 0
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen or not isinstance(adapter, HTTPAdapter):
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            num_requests += pool.num_requests
+            num_connections += pool.num_connections
+
+    return {
+        "requests": num_requests,
+        "hits": max(num_requests - num_connections, 0),
+        "misses": num_connections,
+    }
+
+
+def wire_bytes(response):
+    """
+    Size of a downloaded response body as it was sent over the wire, i.e.
+    before gzip, br or zstd content decoding. It is read from the urllib3
+    response when there is one, otherwise from the Content-Length header,
+    and is the decoded size when neither is available.
+
+    :param requests.Response response: Response whose body was read
+
+    :returns: Number of bytes
+    :rtype: int
+    """
+
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'tell'):
+        read = raw.tell()
+        if read:
+            return read
+    length = response.headers.get('Content-Length')
+    if length and length.isdigit():
+        return int(length)
+    return len(response.content)
+
+
+def build_response(status_code, headers, content, url, reason=None):
+    """
+    Build a requests response around an already downloaded body so responses
+    that did not come through a requests session can still be wrapped in a
+    ClimacellResponse.
+
+    :param int status_code: HTTP status code
+    :param dict headers: Response headers
+    :param bytes content: Raw response body
+    :param string url: Final request url
+    :param string reason: HTTP reason phrase
+
+    :returns: Response with the body already loaded
+    :rtype: requests.Response
+    """
+
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.reason = reason
+    response.url = url
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+def strip_apikey(url):
+    """
+    Remove the apikey query param from a url so it can be stored or logged.
+
+    :param string url: Request url
+
+    :returns: The url without its apikey param
+    :rtype: string
+    """
+
+    if not url:
+        return url
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query)
+             if name != "apikey"]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def body_headers(headers):
+    """
+    Copy of response headers without those describing the encoding on the
+    wire, which no longer apply once the decoded body is stored.
+
+    :param dict headers: Response headers
+
+    :rtype: dict
+    """
+
+    return {name: value for name, value in headers.items()
+            if name.lower() not in _WIRE_HEADERS}
+
+
+_WIRE_HEADERS = frozenset(
+        ('content-encoding', 'content-length', 'transfer-encoding'))
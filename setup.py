@@ -27,9 +27,23 @@ setup(
             "python-dateutil >= 2.0",
         ],
     extras_require={
+        "async": [
+            "aiohttp >= 3.0",
+            ],
+        "numpy": [
+            "numpy >= 1.13",
+            ],
+        "compression": [
+            "brotli >= 1.0",
+            ],
+        "json": [
+            "orjson >= 3.0; python_version >= '3.6'",
+            ],
         "dev": [
             "pytest >= 5.0",
             "vcrpy >= 4.0",
+            "aiohttp >= 3.0",
+            "pyyaml >= 5.1",
             ],
     },
 )
@@ -0,0 +1,116 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class FakeAdapter(BaseAdapter):
+    """
+    Transport adapter that answers requests from a handler function instead of
+    the network. The handler gets the url path and query params and returns a
+    (status_code, json_body) or (status_code, json_body, headers) tuple.
+    """
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.calls = []
+        self.send_kwargs = []
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        params = dict(parse_qsl(url.query))
+        self.calls.append((url.path, params))
+        self.send_kwargs.append(kwargs)
+        result = self.handler(url.path, params)
+        status, body = result[:2]
+        headers = {'Content-Type': 'application/json'}
+        if len(result) > 2:
+            headers.update(result[2])
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode('utf-8')
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def realtime_body(path, params):
+    body = {
+        'lat': float(params['lat']),
+        'lon': float(params['lon']),
+        'observation_time': {'value': '2020-06-22T20:44:29.185Z'},
+    }
+    for field in params.get('fields', '').split(','):
+        if field:
+            body[field] = {'value': 1.5, 'units': 'C'}
+    return 200, body
+
+
+@pytest.fixture
+def fake_session():
+    """
+    Factory returning a (session, adapter) pair whose https traffic is served
+    by FakeAdapter with the given handler (realtime_body by default).
+    """
+
+    def make(handler=realtime_body):
+        adapter = FakeAdapter(handler)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        return session, adapter
+
+    return make
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        status, body = realtime_body(url.path, dict(parse_qsl(url.query)))
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Local keep-alive HTTP server answering with realtime_body, gzipped when
+    the request accepts it.
+    """
+
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from climacell_api.async_client import AsyncClimacellApiClient
+from climacell_api.cache import DiskCache, MemoryCache
+from climacell_api.climacell_response import ObservationData
+from climacell_api.metrics import HistogramCollector
+
+
+class FakeAiohttpResponse:
+
+    def __init__(self, session, url, params):
+        self.session = session
+        self.url = url
+        self.params = params
+        self.status = 200
+        self.reason = 'OK'
+        self.headers = {'Content-Type': 'application/json; charset=utf-8'}
+
+    async def __aenter__(self):
+        self.session.in_flight += 1
+        self.session.max_in_flight = max(self.session.max_in_flight,
+                                         self.session.in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.session.in_flight -= 1
+
+    async def read(self):
+        await asyncio.sleep(0.01)
+        return json.dumps({
+            'lat': float(self.params['lat']),
+            'lon': float(self.params['lon']),
+            'observation_time': {'value': '2020-06-22T20:44:29.185Z'},
+            'temp': {'value': 21.5, 'units': 'C'},
+        }).encode('utf-8')
+
+
+class FakeAiohttpSession:
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, url, params, **kwargs):
+        self.calls.append((url, params))
+        return FakeAiohttpResponse(self, url, params)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_realtime():
+    session = FakeAiohttpSession()
+    api_client = AsyncClimacellApiClient(key='KEY', session=session)
+    response = run(api_client.realtime(lat=12, lon=13, fields=['temp']))
+
+    assert response.status_code == 200
+    data = response.data()
+    assert isinstance(data, ObservationData)
+    assert data.lat == 12
+    assert data.measurements['temp'].value == 21.5
+    assert session.calls[0][0] == (
+            'https://api.climacell.co/v3/weather/realtime')
+
+
+def test_concurrency_is_bounded():
+    session = FakeAiohttpSession()
+    api_client = AsyncClimacellApiClient(
+            key='KEY', session=session, max_concurrency=3)
+
+    async def fetch_all():
+        return await asyncio.gather(*[
+            api_client.realtime(lat=lat, lon=13, fields=['temp'])
+            for lat in range(10)])
+
+    responses = run(fetch_all())
+
+    assert [r.data().lat for r in responses] == list(range(10))
+    assert session.max_in_flight == 3
+
+
+def test_realtime_many():
+    session = FakeAiohttpSession()
+    api_client = AsyncClimacellApiClient(key='KEY', session=session)
+
+    async def fetch_all():
+        results = []
+        for next_result in api_client.realtime_many(
+                [(lat, 13) for lat in range(5)], fields=['temp']):
+            results.append(await next_result)
+        return results
+
+    results = run(fetch_all())
+
+    assert sorted(r.location for r in results) == [
+            (lat, 13) for lat in range(5)]
+    assert all(r.data().lat == r.location[0] for r in results)
+
+
+def test_realtime_many_bounds_requests_in_flight():
+    session = FakeAiohttpSession()
+    api_client = AsyncClimacellApiClient(key='KEY', session=session)
+    pulled = []
+
+    def locations():
+        for lat in range(10):
+            pulled.append(lat)
+            yield lat, 13
+
+    async def fetch_all():
+        results = []
+        for next_result in api_client.realtime_many(
+                locations(), fields=['temp'], max_workers=3):
+            assert len(pulled) - len(results) <= 3
+            results.append(await next_result)
+        return results
+
+    results = run(fetch_all())
+
+    assert sorted(r.location[0] for r in results) == list(range(10))
+    assert session.max_in_flight == 3
+
+
+def test_coalesced_requests_share_one_call():
+    session = FakeAiohttpSession()
+    api_client = AsyncClimacellApiClient(
+            key='KEY', session=session, snap_resolution=0.5, coalesce=True)
+
+    async def fetch_all():
+        return await asyncio.gather(*[
+            api_client.realtime(lat=12 + i * 0.01, lon=13, fields=['temp'])
+            for i in range(5)])
+
+    responses = run(fetch_all())
+
+    assert len(session.calls) == 1
+    assert all(r.data().lat == 12 for r in responses)
+
+
+def test_instruments_see_requests():
+    collector = HistogramCollector()
+    api_client = AsyncClimacellApiClient(
+            key='KEY', session=FakeAiohttpSession(), instruments=[collector])
+    response = run(api_client.realtime(lat=12, lon=13, fields=['temp']))
+    response.data()
+
+    snapshot = collector.snapshot()['/weather/realtime']
+    assert snapshot['cache.miss'] == 1
+    assert snapshot['ttfb']['count'] == 1
+    assert snapshot['parse.data']['count'] == 1
+
+
+def test_pool_stats_count_requests():
+    api_client = AsyncClimacellApiClient(key='KEY',
+                                         session=FakeAiohttpSession())
+    run(api_client.realtime(lat=12, lon=13, fields=['temp']))
+
+    assert api_client.pool_stats() == {
+            'requests': 1, 'hits': None, 'misses': None}
+
+
+def test_aiohttp_session_against_a_server(stub_server):
+    aiohttp = pytest.importorskip('aiohttp')
+
+    async def fetch():
+        async with AsyncClimacellApiClient(
+                key='KEY', timeout=(1, 2)) as api_client:
+            api_client.BASE_URL = stub_server
+            responses = [
+                await api_client.realtime(lat=12, lon=13, fields=['temp'])
+                for _ in range(3)]
+            assert isinstance(api_client.session, aiohttp.ClientSession)
+            return responses, api_client.pool_stats(), api_client
+
+    responses, stats, api_client = run(fetch())
+
+    assert [r.data().measurements['temp'].value for r in responses] == [
+            1.5, 1.5, 1.5]
+    assert responses[0].headers['Content-Encoding'] == 'gzip'
+    assert responses[0].elapsed.total_seconds() > 0
+    assert stats == {'requests': 3, 'hits': 2, 'misses': 1}
+    assert api_client.session is None
+
+
+def test_takes_the_options_of_the_sync_client():
+    api_client = AsyncClimacellApiClient(
+            key='KEY', cache=MemoryCache(), merge_fields=True,
+            chunk_sizes={'/weather/historical/climacell': None},
+            stale_if_error=60, passthrough=True)
+
+    assert api_client.merge_fields and api_client.passthrough
+    assert api_client.stale_if_error == 60
+    assert api_client.chunk_sizes['/weather/historical/climacell'] is None
+    assert not api_client.stream
+    with pytest.raises(TypeError):
+        AsyncClimacellApiClient(key='KEY', stream=True)
+
+
+def test_disk_cache_is_used_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingCache(DiskCache):
+
+        def get(self, key, max_stale=0):
+            threads.append(threading.get_ident())
+            return super().get(key, max_stale)
+
+    session = FakeAiohttpSession()
+    api_client = AsyncClimacellApiClient(
+            key='KEY', session=session, cache=RecordingCache(str(tmp_path)))
+
+    async def fetch_twice():
+        for _ in range(2):
+            response = await api_client.realtime(lat=12, lon=13,
+                                                 fields=['temp'])
+        return response
+
+    response = run(fetch_twice())
+
+    assert response.data().measurements['temp'].value == 21.5
+    assert len(session.calls) == 1
+    assert threading.get_ident() not in threads
+
+
+def test_refreshing_is_scoped_to_the_task():
+    session = FakeAiohttpSession()
+    api_client = AsyncClimacellApiClient(key='KEY', session=session,
+                                         cache=MemoryCache())
+
+    async def fetch():
+        return await api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    async def refresh():
+        with api_client.refreshing():
+            await fetch()
+
+    async def main():
+        await fetch()
+        await asyncio.gather(refresh(), fetch())
+
+    run(main())
+
+    assert len(session.calls) == 2
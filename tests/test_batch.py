@@ -0,0 +1,40 @@
+import requests
+
+from climacell_api.climacell_response import ErrorData
+from climacell_api.client import ClimacellApiClient
+from conftest import realtime_body
+
+
+def test_realtime_many_tags_results_with_location(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session)
+    locations = [(lat, 13) for lat in range(20)]
+
+    results = list(api_client.realtime_many(
+            locations, fields=['temp'], max_workers=4))
+
+    assert sorted(r.location for r in results) == locations
+    for result in results:
+        assert result.error is None
+        assert result.data().lat == result.location[0]
+    assert len(adapter.calls) == 20
+
+
+def test_realtime_many_isolates_errors(fake_session):
+    def handler(path, params):
+        if params['lat'] == '3':
+            raise requests.exceptions.ConnectionError('connection reset')
+        return realtime_body(path, params)
+
+    session, _ = fake_session(handler)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+
+    results = {r.location: r for r in api_client.realtime_many(
+            [(lat, 13) for lat in range(5)], fields=['temp'])}
+
+    assert len(results) == 5
+    error = results[(3, 13)].data()
+    assert isinstance(error, ErrorData)
+    assert error.error_code == 'ConnectionError'
+    assert error.error_message == 'connection reset'
+    assert results[(4, 13)].data().lat == 4
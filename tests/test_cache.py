@@ -0,0 +1,105 @@
+import json
+import os
+import time
+
+from climacell_api.cache import CacheEntry, DiskCache, MemoryCache, cache_key
+from climacell_api.client import ClimacellApiClient
+from climacell_api.transport import build_response
+
+
+def test_cache_key_ignores_apikey_and_field_order():
+    key_a = cache_key('/weather/realtime', {
+        'lat': 12, 'lon': 13, 'fields': 'temp,wind_gust', 'apikey': 'A'})
+    key_b = cache_key('/weather/realtime', {
+        'apikey': 'B', 'fields': 'wind_gust,temp', 'lon': '13', 'lat': '12'})
+
+    assert key_a == key_b
+
+
+def test_cache_key_normalizes_coordinates():
+    assert cache_key('/weather/realtime', {'lat': 12, 'lon': 13}) == \
+        cache_key('/weather/realtime', {'lat': 12.0, 'lon': '13'})
+
+
+def test_repeated_requests_hit_cache(fake_session):
+    session, adapter = fake_session()
+    cache = MemoryCache()
+    api_client = ClimacellApiClient(key='KEY', session=session, cache=cache)
+
+    first = api_client.realtime(lat=12, lon=13, fields=['temp', 'wind_gust'])
+    second = api_client.realtime(lat=12, lon=13, fields=['wind_gust', 'temp'])
+    api_client.realtime(lat=14, lon=13, fields=['temp'])
+
+    assert len(adapter.calls) == 2
+    assert second.json() == first.json()
+    assert cache.stats == {'hits': 1, 'misses': 2, 'evictions': 0}
+
+
+def test_expired_entries_are_refetched(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(),
+            cache_ttls={'/weather/realtime': 0.05})
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert len(adapter.calls) == 2
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(maxsize=2)
+    for key in ('a', 'b'):
+        cache.set(key, CacheEntry(key, time.time(), 60))
+    cache.get('a')
+    cache.set('c', CacheEntry('c', time.time(), 60))
+
+    assert cache.get('b') is None
+    assert cache.get('a').response == 'a'
+    assert cache.stats['evictions'] == 1
+
+
+def test_disk_cache_is_shared_between_clients(fake_session, tmp_path):
+    session, adapter = fake_session()
+    for _ in range(2):
+        api_client = ClimacellApiClient(
+                key='KEY', session=session, cache=DiskCache(str(tmp_path)))
+        response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+        assert response.data().measurements['temp'].value == 1.5
+
+    assert len(adapter.calls) == 1
+    assert 'apikey' not in response.url
+
+
+def test_disk_cache_evicts_in_batches(tmp_path):
+    cache = DiskCache(str(tmp_path), maxsize=10)
+    for i in range(11):
+        cache.set(str(i), CacheEntry(_response(), time.time(), 60))
+    assert len(os.listdir(str(tmp_path))) == 11
+
+    cache.set('11', CacheEntry(_response(), time.time(), 60))
+
+    assert len(os.listdir(str(tmp_path))) == 10
+    assert cache.stats['evictions'] == 2
+
+
+def test_disk_cache_files_are_json_and_body(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set('a', CacheEntry(_response(), 123.0, 60,
+                              fields=frozenset(['temp'])))
+
+    with open(os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0]),
+              'rb') as f:
+        meta, _, body = f.read().partition(b'\n')
+    assert json.loads(meta.decode('utf-8'))['fields'] == ['temp']
+    assert body == b'{"temp": 1}'
+
+    entry = cache.get('a', max_stale=float('inf'))
+    assert entry.fields == frozenset(['temp'])
+    assert entry.response.json() == {'temp': 1}
+
+
+def _response():
+    return build_response(200, {'Content-Type': 'application/json'},
+                          b'{"temp": 1}', 'https://api.climacell.co/v3/x')
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+
+from climacell_api.client import ClimacellApiClient, split_window, to_datetime
+
+START = datetime(2020, 6, 24, 12, tzinfo=timezone.utc)
+
+
+def series_body(path, params):
+    start = to_datetime(params['start_time'])
+    end = to_datetime(params['end_time'])
+    step = timedelta(minutes=int(params.get('timestep', 15)))
+    body = []
+    while start <= end:
+        body.append({
+            'observation_time': {
+                'value': start.strftime('%Y-%m-%dT%H:%M:%S.000Z')},
+            'temp': {'value': start.hour + start.minute / 60, 'units': 'C'}})
+        start += step
+    return 200, body
+
+
+def test_split_window_aligns_chunks_to_step():
+    windows = split_window(START, START + timedelta(minutes=100),
+                           timedelta(minutes=40), timedelta(minutes=15))
+
+    assert windows == [
+        (START, START + timedelta(minutes=30)),
+        (START + timedelta(minutes=30), START + timedelta(minutes=60)),
+        (START + timedelta(minutes=60), START + timedelta(minutes=90)),
+        (START + timedelta(minutes=90), START + timedelta(minutes=100)),
+    ]
+
+
+def test_chunked_historical_climacell_matches_single_request(fake_session):
+    session, adapter = fake_session(series_body)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+    kwargs = dict(lat=43.08, lon=-89.54, fields=['temp'], timestep=30,
+                  start_time=START, end_time=START + timedelta(hours=4))
+
+    single = api_client.historical_climacell(**kwargs)
+    chunked = api_client.historical_climacell(
+            chunk_size=timedelta(hours=1), **kwargs)
+
+    assert len(adapter.calls) == 5
+    assert chunked.status_code == 200
+    assert chunked.json() == single.json()
+    assert len(chunked.data()) == 9
+
+
+def test_chunked_historical_station(fake_session):
+    session, _ = fake_session(series_body)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+
+    response = api_client.historical_station(
+            lat=43.08, lon=-89.54, fields=['temp'], start_time=START,
+            end_time=(START + timedelta(days=1)).isoformat(),
+            chunk_size=timedelta(hours=6))
+
+    assert response.status_code == 200
+    assert len(response.data()) == 24 * 4 + 1
+
+
+def test_chunk_error_is_returned(fake_session):
+    def handler(path, params):
+        if to_datetime(params['start_time']).hour == 18:
+            return 429, {'statusCode': 429, 'errorCode': 'TooManyRequests',
+                         'message': 'API rate limit exceeded'}
+        return series_body(path, params)
+
+    session, _ = fake_session(handler)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+
+    response = api_client.historical_station(
+            lat=43.08, lon=-89.54, fields=['temp'], start_time=START,
+            end_time=START + timedelta(days=1),
+            chunk_size=timedelta(hours=6))
+
+    assert response.status_code == 429
+    assert response.data().error_code == 'TooManyRequests'
+
+
+def test_long_station_windows_are_chunked_by_default(fake_session):
+    session, adapter = fake_session(series_body)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+
+    response = api_client.historical_station(
+            lat=43.08, lon=-89.54, fields=['temp'], start_time=START,
+            end_time=START + timedelta(days=3))
+
+    assert len(adapter.calls) == 3
+    assert len(response.data()) == 3 * 24 * 4 + 1
+
+
+def test_default_chunking_can_be_turned_off(fake_session):
+    session, adapter = fake_session(series_body)
+    api_client = ClimacellApiClient(
+            key='KEY', session=session,
+            chunk_sizes={'/weather/historical/station': None})
+
+    api_client.historical_station(
+            lat=43.08, lon=-89.54, fields=['temp'], start_time=START,
+            end_time=START + timedelta(days=3))
+
+    assert len(adapter.calls) == 1
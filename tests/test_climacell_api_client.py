@@ -364,3 +364,21 @@ def test_insights_fireindex():
     data = response.data()
     assert data.fire_index == 30.474195
     assert response.json() == [{'fire_index': 30.474195}]
+
+
+@my_vcr.use_cassette('tests/vcr_cassettes/historical-station.yml')
+def test_historical_station_streamed():
+    api_client = ClimacellApiClient(key=os.getenv('CLIMACELL_KEY'),
+                                    stream=True)
+    start_time = datetime(2020, 6, 23, 20, tzinfo=timezone.utc)
+    end_time = start_time + timedelta(hours=4)
+    response = api_client.historical_station(
+            lat='43.08', lon='-89.54', start_time=start_time,
+            end_time=end_time, fields=['temp', 'precipitation_type'])
+
+    assert response.status_code == 200
+    data = list(response.iter_data(chunk_size=128))
+    assert len(data) == 12
+    assert data[0].observation_time == dateutil.parser.parse(
+            '2020-06-23T20:15:00.000Z')
+    assert data[0].measurements['temp'].value == 22.4
@@ -0,0 +1,212 @@
+import io
+import json
+import math
+from array import array
+from datetime import timezone
+
+import dateutil.parser
+import pytest
+import requests
+
+from climacell_api import json_backend
+from climacell_api.climacell_response import (ClimacellResponse,
+                                              DailyObservationData,
+                                              ObservationData,
+                                              _iter_json_array,
+                                              parse_epoch_us, parse_time)
+from climacell_api.transport import build_response
+
+
+@pytest.mark.parametrize('value', [
+    '2020-06-22T20:44:29.185Z',
+    '2020-06-23T11:00:00Z',
+    '2020-06-23T11:00:00.1Z',
+    '2020-06-23',
+    '2020-06-23T11:00:00+02:00',
+    'June 23 2020',
+])
+def test_parse_time_matches_dateutil(value):
+    parsed = parse_time(value)
+
+    assert parsed == dateutil.parser.parse(value)
+    assert parsed.utcoffset() == dateutil.parser.parse(value).utcoffset()
+
+
+@pytest.mark.parametrize('value', [
+    '2020-06-22T20:44:29.185Z',
+    '2020-06-23T11:00:00Z',
+    '2020-06-23',
+    '2020-06-23T11:00:00+02:00',
+    '1969-12-31T23:59:59.5Z',
+])
+def test_parse_epoch_us_matches_parse_time(value):
+    parsed = parse_time(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    assert parse_epoch_us(value) == round(parsed.timestamp() * 1000000)
+
+
+def test_observation_properties_are_parsed_once():
+    data = ObservationData({
+        'observation_time': {'value': '2020-06-22T20:44:29.185Z'},
+        'temp': {'value': 21.5, 'units': 'C'},
+    }, ['temp'])
+
+    assert data.observation_time is data.observation_time
+    assert data.measurements is data.measurements
+    assert data.measurements['temp'].value == 21.5
+
+
+def test_daily_min_max_times_are_parsed_once():
+    data = DailyObservationData({
+        'observation_time': {'value': '2020-06-23'},
+        'temp': [{'observation_time': '2020-06-23T11:00:00Z',
+                  'min': {'value': 12, 'units': 'C'}}],
+    }, ['temp'])
+
+    assert data.measurements is data.measurements
+    assert data.measurements['temp']['min'].observation_time == (
+            dateutil.parser.parse('2020-06-23T11:00:00Z'))
+
+
+def test_drop_raw_json_keeps_parsed_values():
+    data = ObservationData({
+        'lat': 12,
+        'lon': 13,
+        'observation_time': {'value': '2020-06-22T20:44:29.185Z'},
+        'temp': {'value': 21.5, 'units': 'C'},
+    }, ['temp']).drop_raw_json()
+
+    assert data.raw_json is None
+    assert (data.lat, data.lon) == (12, 13)
+    assert data.observation_time == parse_time('2020-06-22T20:44:29.185Z')
+    assert data.measurements['temp'].units == 'C'
+    assert not hasattr(data, '__dict__')
+    assert not hasattr(data.measurements['temp'], '__dict__')
+
+
+def nowcast_response(body, response_type='forecast'):
+    return ClimacellResponse(
+            build_response(200, {}, json.dumps(body).encode('utf-8'), ''),
+            fields=['temp', 'precipitation_type'],
+            response_type=response_type)
+
+
+NOWCAST = [
+    {'observation_time': {'value': '2020-06-22T20:00:00.000Z'},
+     'temp': {'value': 21.5, 'units': 'C'},
+     'precipitation_type': {'value': 'none'}},
+    {'observation_time': {'value': '2020-06-22T20:01:00.000Z'},
+     'temp': {'value': None, 'units': 'C'},
+     'precipitation_type': {'value': 'rain'}},
+]
+
+
+def test_to_columns():
+    columns = nowcast_response(NOWCAST).to_columns()
+
+    assert len(columns) == 2
+    assert columns.observation_time == array('q', [
+            1592856000000000, 1592856060000000])
+    assert columns.datetimes() == [
+            parse_time('2020-06-22T20:00:00.000Z'),
+            parse_time('2020-06-22T20:01:00.000Z')]
+    assert columns.values['temp'][0] == 21.5
+    assert math.isnan(columns.values['temp'][1])
+    assert columns.values['precipitation_type'] == ['none', 'rain']
+    assert columns.units == {'temp': 'C'}
+
+
+def test_response_datetimes():
+    times = [parse_time('2020-06-22T20:00:00.000Z'),
+             parse_time('2020-06-22T20:01:00.000Z')]
+
+    assert nowcast_response(NOWCAST).datetimes() == times
+    assert nowcast_response(NOWCAST[0], 'realtime').datetimes() == times[:1]
+
+
+def test_to_columns_splits_daily_min_max():
+    columns = nowcast_response([{
+        'observation_time': {'value': '2020-06-23'},
+        'temp': [{'observation_time': '2020-06-23T11:00:00Z',
+                  'min': {'value': 12, 'units': 'C'}},
+                 {'observation_time': '2020-06-23T19:00:00Z',
+                  'max': {'value': 25, 'units': 'C'}}],
+    }], response_type='daily_forecast').to_columns()
+
+    assert list(columns.values['temp.min']) == [12]
+    assert list(columns.values['temp.max']) == [25]
+
+
+def test_from_json_skips_decoding(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("body was decoded")
+
+    response = ClimacellResponse.from_json(
+            build_response(200, {}, b'', ''), NOWCAST,
+            fields=['temp', 'precipitation_type'])
+    monkeypatch.setattr(json_backend, 'decode', fail)
+
+    assert response.json() is NOWCAST
+    assert response.data()[0].measurements['temp'].value == 21.5
+    assert response.to_columns().values['precipitation_type'] == [
+            'none', 'rain']
+
+
+def test_to_numpy():
+    np = pytest.importorskip('numpy')
+    arrays = nowcast_response(NOWCAST).to_numpy()
+
+    assert arrays['observation_time'][1] == np.datetime64(
+            '2020-06-22T20:01:00')
+    assert arrays['temp'].dtype == np.float64
+    assert arrays['temp'][0] == 21.5
+    assert list(arrays['precipitation_type']) == ['none', 'rain']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_iter_data_matches_data(chunk_size):
+    body = NOWCAST * 10 + [{
+        'observation_time': {'value': '2020-06-22T20:02:00.000Z'},
+        'temp': {'value': 12345678, 'units': '°C'},
+        'precipitation_type': {'value': 'snow'}}]
+    response = nowcast_response(body)
+
+    streamed = list(response.iter_data(chunk_size=chunk_size))
+
+    assert [o.raw_json for o in streamed] == body
+    assert [o.observation_time for o in streamed] == [
+            o.observation_time for o in response.data()]
+
+
+def test_iter_data_reads_from_raw_stream():
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(json.dumps(NOWCAST, indent=2).encode('utf-8'))
+    climacell_response = ClimacellResponse(
+            response, fields=['temp', 'precipitation_type'])
+
+    data = climacell_response.iter_data(chunk_size=16)
+
+    assert next(data).measurements['temp'].value == 21.5
+    assert next(data).measurements['precipitation_type'].value == 'rain'
+    assert next(data, None) is None
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5])
+def test_iter_json_array_waits_for_whole_scalars(chunk_size):
+    body = b'[true, {}, 96651.47, 1e5, null, "a", -2 ,[1.5]]'
+    chunks = [body[i:i + chunk_size]
+              for i in range(0, len(body), chunk_size)]
+
+    assert list(_iter_json_array(chunks)) == [
+            True, {}, 96651.47, 1e5, None, 'a', -2, [1.5]]
+
+
+def test_iter_data_rejects_truncated_body():
+    response = nowcast_response(NOWCAST)
+    response.request_response._content = json.dumps(NOWCAST)[:-20].encode()
+
+    with pytest.raises(ValueError):
+        list(response.iter_data(chunk_size=16))
@@ -0,0 +1,53 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from climacell_api.client import ClimacellApiClient, snap_coordinate
+from conftest import realtime_body
+
+
+def test_snap_coordinate():
+    assert snap_coordinate('40.0123', 0.05) == 40.0
+    assert snap_coordinate(40.0301, 0.05) == 40.05
+    assert snap_coordinate(-89.5449, 0.01) == -89.54
+
+
+def test_client_snap():
+    assert ClimacellApiClient(key='KEY', snap_resolution=0.1).snap(
+            40.0123, -89.547) == (40.0, -89.5)
+    assert ClimacellApiClient(key='KEY').snap(40.0123, 13) == (40.0123, 13)
+
+
+def test_snapped_coordinates_are_requested(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, snap_resolution=0.1)
+
+    data = api_client.realtime(lat=40.0123, lon=-89.547,
+                               fields=['temp']).data()
+
+    assert adapter.calls[0][1]['lat'] == '40.0'
+    assert adapter.calls[0][1]['lon'] == '-89.5'
+    assert (data.lat, data.lon) == (40.0, -89.5)
+
+
+def test_concurrent_requests_in_same_cell_share_one_call(fake_session):
+    release = threading.Event()
+
+    def slow_handler(path, params):
+        release.wait(5)
+        return realtime_body(path, params)
+
+    session, adapter = fake_session(slow_handler)
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, snap_resolution=0.1, coalesce=True)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(api_client.realtime, 40 + i * 0.001, 13,
+                                   ['temp']) for i in range(8)]
+        time.sleep(0.1)
+        release.set()
+        responses = [f.result() for f in futures]
+
+    assert len(adapter.calls) == 1
+    assert all(r.data().lat == 40.0 for r in responses)
@@ -0,0 +1,73 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from climacell_api.client import ClimacellApiClient
+from climacell_api.grid import fetch_grid, grid_axes
+from climacell_api.parallel import ProcessPoolParser
+
+np = pytest.importorskip('numpy')
+
+
+def hourly_body(path, params):
+    lat, lon = float(params['lat']), float(params['lon'])
+    if (lat, lon) == (40.1, -89.0):
+        raise requests.exceptions.ConnectionError('down')
+    # The north east corner only has the first hour
+    hours = 1 if (lat, lon) == (40.1, -88.9) else 2
+    return 200, [{
+        'lat': lat,
+        'lon': lon,
+        'observation_time': {
+            'value': '2020-06-22T{:02d}:00:00.000Z'.format(20 + hour)},
+        'temp': {'value': lat + lon + hour, 'units': 'C'},
+        'precipitation_type': {'value': 'none'},
+    } for hour in range(hours)]
+
+
+def test_grid_axes():
+    lats, lons = grid_axes((40, -89, 40.1, -88.85), 0.05)
+
+    assert lats == [40.0, 40.05, 40.1]
+    assert lons == [-89.0, -88.95, -88.9, -88.85]
+    with pytest.raises(ValueError):
+        grid_axes((41, -89, 40, -88), 0.05)
+
+
+def test_fetch_grid(fake_session):
+    session, adapter = fake_session(hourly_body)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+
+    grid = fetch_grid(api_client, (40.0, -89.0, 40.1, -88.9), 0.1,
+                      fields=['temp', 'precipitation_type'])
+
+    assert len(adapter.calls) == 4
+    assert grid.values.shape == (2, 2, 2, 1)
+    assert grid.fields == ['temp']
+    assert grid.units == {'temp': 'C'}
+    assert list(grid.lat) == [40.0, 40.1]
+    assert list(grid.lon) == [-89.0, -88.9]
+    assert grid.time[1] == np.datetime64('2020-06-22T21:00:00')
+
+    temp = grid.field('temp')
+    assert temp[1, 0, 1] == pytest.approx(40.0 - 88.9 + 1)
+    assert temp[0, 1, 1] == pytest.approx(40.1 - 88.9)
+    assert math.isnan(temp[1, 1, 1])
+    assert np.isnan(temp[:, 1, 0]).all()
+    assert grid.errors[(40.1, -89.0)].error_code == 'ConnectionError'
+
+
+def test_fetch_grid_with_parser(fake_session):
+    session, _ = fake_session(hourly_body)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+    bbox = (40.0, -89.0, 40.1, -88.9)
+
+    with ThreadPoolExecutor(2) as executor:
+        parsed = fetch_grid(api_client, bbox, 0.1, fields=['temp'],
+                            parser=ProcessPoolParser(executor=executor))
+    expected = fetch_grid(api_client, bbox, 0.1, fields=['temp'])
+
+    np.testing.assert_array_equal(parsed.values, expected.values)
+    assert set(parsed.errors) == {(40.1, -89.0)}
@@ -0,0 +1,71 @@
+import pytest
+
+from climacell_api import json_backend
+from climacell_api.climacell_response import ClimacellResponse
+from climacell_api.transport import build_response
+
+BODY = (b'[{"observation_time": {"value": "2020-06-22T20:00:00.000Z"},'
+        b' "temp": {"value": 21.5, "units": "C"}}]')
+
+
+@pytest.fixture
+def backend():
+    yield json_backend.use
+    json_backend.use()
+
+
+def response(content=BODY):
+    return ClimacellResponse(build_response(200, {}, content, ''),
+                             fields=['temp'])
+
+
+@pytest.mark.parametrize('name', ['orjson', 'json'])
+def test_backends_decode_the_same(backend, name):
+    pytest.importorskip(name)
+    assert backend(name) == name == json_backend.name
+
+    assert response().json()[0]['temp'] == {'value': 21.5, 'units': 'C'}
+
+
+def test_unknown_backend(backend):
+    with pytest.raises(ValueError):
+        backend('yaml')
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    calls = []
+    decode = json_backend.decode
+    monkeypatch.setattr(json_backend, 'decode',
+                        lambda r: calls.append(r) or decode(r))
+    return calls
+
+
+def test_body_is_decoded_once(decode_calls):
+    climacell_response = response()
+
+    first = climacell_response.json()
+    data = climacell_response.data()
+    climacell_response.data()
+    climacell_response.to_columns()
+
+    assert len(decode_calls) == 1
+    assert climacell_response.json() is first
+    assert data[0].raw_json is first[0]
+
+
+def test_data_without_raw_json_is_not_memoized(decode_calls):
+    climacell_response = response()
+    climacell_response.data(keep_raw_json=False)
+    climacell_response.json()
+
+    assert len(decode_calls) == 2
+
+
+@pytest.mark.parametrize('name', ['orjson', 'json'])
+def test_invalid_body_raises_like_requests(backend, name):
+    pytest.importorskip(name)
+    backend(name)
+
+    with pytest.raises(ValueError):
+        response(b'<html>Bad Gateway</html>').json()
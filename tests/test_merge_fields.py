@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from climacell_api.cache import MemoryCache
+from climacell_api.client import ClimacellApiClient
+from conftest import realtime_body
+
+
+def test_cached_superset_serves_subset(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    cache=MemoryCache(), merge_fields=True)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp', 'wind_gust'])
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert len(adapter.calls) == 1
+    assert list(response.data().measurements) == ['temp']
+
+
+def test_missing_field_widens_cached_entry(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    cache=MemoryCache(), merge_fields=True)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    api_client.realtime(lat=12, lon=13, fields=['wind_gust'])
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert [params['fields'] for _, params in adapter.calls] == [
+            'temp', 'temp,wind_gust']
+    assert list(response.data().measurements) == ['temp']
+
+
+def test_expired_entry_is_refetched_with_its_fields(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(),
+            merge_fields=True, cache_ttls={'/weather/realtime': 0.05})
+
+    api_client.realtime(lat=12, lon=13, fields=['temp', 'humidity'])
+    time.sleep(0.06)
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    api_client.realtime(lat=12, lon=13, fields=['humidity'])
+
+    assert [params['fields'] for _, params in adapter.calls] == [
+            'humidity,temp', 'humidity,temp']
+
+
+def test_stale_entry_is_revalidated_with_its_fields(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(),
+            merge_fields=True, cache_ttls={'/weather/realtime': 0.05},
+            stale_while_revalidate=60)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp', 'humidity'])
+    time.sleep(0.06)
+    stale = api_client.realtime(lat=12, lon=13, fields=['temp'])
+    api_client.close()
+    api_client.realtime(lat=12, lon=13, fields=['humidity'])
+
+    assert stale.stale
+    assert [params['fields'] for _, params in adapter.calls] == [
+            'humidity,temp', 'humidity,temp']
+
+
+def test_concurrent_requests_share_superset_call(fake_session):
+    release = threading.Event()
+
+    def slow_handler(path, params):
+        release.wait(5)
+        return realtime_body(path, params)
+
+    session, adapter = fake_session(slow_handler)
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    merge_fields=True)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        wide = executor.submit(api_client.realtime, 12, 13,
+                               ['temp', 'wind_gust'])
+        time.sleep(0.05)
+        narrow = [executor.submit(api_client.realtime, 12, 13, [field])
+                  for field in ('temp', 'wind_gust')]
+        time.sleep(0.05)
+        release.set()
+
+        assert list(wide.result().data().measurements) == [
+                'temp', 'wind_gust']
+        assert [list(f.result().data().measurements) for f in narrow] == [
+                ['temp'], ['wind_gust']]
+
+    assert len(adapter.calls) == 1
@@ -0,0 +1,147 @@
+import pytest
+import requests
+
+from climacell_api.cache import MemoryCache
+from climacell_api.client import ClimacellApiClient
+from climacell_api.metrics import (HistogramCollector, Instrument,
+                                   OpenTelemetryInstrument, ParseEvent,
+                                   RequestEvent)
+
+
+class RecordingInstrument(Instrument):
+
+    def __init__(self):
+        self.requests = []
+        self.parses = []
+
+    def on_request(self, event):
+        self.requests.append(event)
+
+    def on_parse(self, event):
+        self.parses.append(event)
+
+
+def test_requests_report_cache_outcome_latency_and_bytes(fake_session):
+    session, adapter = fake_session()
+    instrument = RecordingInstrument()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    cache=MemoryCache(),
+                                    instruments=[instrument])
+
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    miss, hit = instrument.requests
+    assert miss.endpoint == hit.endpoint == '/weather/realtime'
+    assert (miss.cache, hit.cache) == ('miss', 'hit')
+    assert miss.status_code == 200
+    assert miss.ttfb is not None and miss.total >= miss.ttfb
+    assert hit.ttfb is None
+    assert miss.bytes == hit.bytes == len(response.content)
+    assert miss.wire_bytes == len(response.content)
+    assert hit.wire_bytes is None
+    assert len(adapter.calls) == 1
+
+
+def test_data_and_to_columns_report_parse_time(fake_session):
+    session, _ = fake_session()
+    instrument = RecordingInstrument()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    instruments=[instrument])
+
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+    response.data()
+    response.to_columns()
+
+    assert [(e.endpoint, e.method, e.observations)
+            for e in instrument.parses] == [
+                ('/weather/realtime', 'data', 1),
+                ('/weather/realtime', 'to_columns', 1)]
+    assert all(e.duration >= 0 for e in instrument.parses)
+
+
+def test_failed_requests_are_reported_and_raised(fake_session):
+    def handler(path, params):
+        raise requests.exceptions.ConnectionError('down')
+
+    session, _ = fake_session(handler)
+    instrument = RecordingInstrument()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    instruments=[instrument])
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    event, = instrument.requests
+    assert event.error == 'ConnectionError'
+    assert event.status_code is None
+
+
+def test_histogram_collector():
+    collector = HistogramCollector(buckets=(0.01, 0.1, 1))
+    for total in (0.005, 0.05, 0.05, 0.5, 5):
+        collector.on_request(RequestEvent('/weather/realtime', 'miss',
+                                          status_code=200, total=total,
+                                          ttfb=total / 2, bytes=100))
+    collector.on_request(RequestEvent('/weather/realtime', 'hit',
+                                      status_code=200, total=0.001))
+    collector.on_parse(ParseEvent('/weather/realtime', 'data', 0.002, 1))
+
+    assert collector.percentile('/weather/realtime', 'total', 50) == 0.1
+    assert collector.percentile('/weather/realtime', 'total', 99) == (
+            float('inf'))
+    assert collector.percentile('/weather/realtime', 'parse.data', 99) == (
+            0.01)
+    assert collector.percentile('/weather/nowcast', 'total', 99) is None
+
+    snapshot = collector.snapshot()['/weather/realtime']
+    assert snapshot['cache.miss'] == 5
+    assert snapshot['cache.hit'] == 1
+    assert snapshot['bytes'] == 500
+    assert snapshot['total']['counts'] == [2, 2, 1, 1]
+    assert snapshot['ttfb']['count'] == 5
+
+    collector.reset()
+    assert collector.snapshot() == {}
+
+
+class FakeMeterInstrument:
+
+    def __init__(self, name):
+        self.name = name
+        self.points = []
+
+    def record(self, value, attributes=None):
+        self.points.append((value, attributes))
+
+    add = record
+
+
+class FakeMeter:
+
+    def __init__(self):
+        self.instruments = {}
+
+    def create_histogram(self, name, unit='', description=''):
+        return self.instruments.setdefault(name, FakeMeterInstrument(name))
+
+    create_counter = create_histogram
+
+
+def test_open_telemetry_instrument(fake_session):
+    session, _ = fake_session()
+    meter = FakeMeter()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session,
+            instruments=[OpenTelemetryInstrument(meter)])
+
+    api_client.realtime(lat=12, lon=13, fields=['temp']).data()
+
+    duration = meter.instruments['climacell.client.request.duration']
+    (value, attributes), = duration.points
+    assert attributes == {'endpoint': '/weather/realtime', 'cache': 'miss',
+                          'status_code': 200}
+    (_, attributes), = meter.instruments[
+            'climacell.client.parse.duration'].points
+    assert attributes == {'endpoint': '/weather/realtime', 'method': 'data'}
+    assert meter.instruments['climacell.client.response.bytes'].points
@@ -0,0 +1,98 @@
+import json
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from climacell_api.client import ClimacellApiClient
+from climacell_api.parallel import ProcessPoolParser, parse_columns
+
+
+def nowcast_body(path, params):
+    return 200, [{
+        'lat': float(params['lat']),
+        'lon': float(params['lon']),
+        'observation_time': {
+            'value': '2020-06-22T20:{:02d}:00.000Z'.format(minute)},
+        'temp': {'value': minute + float(params['lat']), 'units': 'C'},
+    } for minute in range(3)]
+
+
+def test_parse_columns_result_is_picklable():
+    content = json.dumps(nowcast_body('', {'lat': 1, 'lon': 2})[1])
+    columns = parse_columns(content.encode('utf-8'), 200, ['temp'])
+
+    copy = pickle.loads(pickle.dumps(columns))
+    assert copy.observation_time == columns.observation_time
+    assert list(copy.values['temp']) == [1.0, 2.0, 3.0]
+    assert copy.units == {'temp': 'C'}
+
+
+def test_process_pool_parses_in_order(fake_session):
+    session, _ = fake_session(nowcast_body)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+    responses = [api_client.nowcast(lat=lat, lon=0, fields=['temp'],
+                                    start_time='now', timestep=1)
+                 for lat in range(4)]
+
+    with ProcessPoolParser(max_workers=2) as parser:
+        parsed = list(parser.map(responses))
+        single = parser.submit(responses[3]).result()
+
+    assert [columns.values['temp'][0] for columns in parsed] == [
+            0.0, 1.0, 2.0, 3.0]
+    assert list(single.values['temp']) == [3.0, 4.0, 5.0]
+
+
+def test_location_results_keep_their_errors(fake_session):
+    def handler(path, params):
+        if params['lat'] == '1':
+            raise requests.exceptions.ConnectionError('down')
+        if params['lat'] == '2':
+            return 403, {'message': 'no'}
+        return nowcast_body(path, params)
+
+    session, _ = fake_session(handler)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+    results = list(api_client.nowcast_many(
+            [(0, 0), (1, 0), (2, 0)], fields=['temp'], start_time='now',
+            timestep=1))
+    results.sort(key=lambda result: result.location)
+
+    with ThreadPoolExecutor(1) as executor:
+        parsed = list(ProcessPoolParser(executor=executor).map(results))
+
+    assert len(parsed[0]) == 3
+    assert parsed[1].error_code == 'ConnectionError'
+    assert parsed[2].error_message == 'no'
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+
+    def __init__(self):
+        super().__init__(1)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_map_submits_responses_as_they_are_read(fake_session):
+    session, _ = fake_session(nowcast_body)
+    api_client = ClimacellApiClient(key='KEY', session=session)
+    executor = RecordingExecutor()
+
+    def responses():
+        for lat in range(5):
+            yield api_client.nowcast(lat=lat, lon=0, fields=['temp'],
+                                     start_time='now', timestep=1)
+            assert executor.submitted == (lat + 1) // 2
+
+    with executor:
+        parsed = list(ProcessPoolParser(executor=executor).map(
+                responses(), chunksize=2))
+
+    assert executor.submitted == 3
+    assert [columns.values['temp'][0] for columns in parsed] == [
+            0.0, 1.0, 2.0, 3.0, 4.0]
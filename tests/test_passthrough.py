@@ -0,0 +1,59 @@
+import json
+
+import pytest
+import requests
+
+from climacell_api import json_backend
+from climacell_api.cache import MemoryCache
+from climacell_api.client import ClimacellApiClient
+from climacell_api.climacell_response import RawResponse
+
+
+@pytest.fixture
+def no_decoding(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("body was decoded")
+
+    monkeypatch.setattr(json_backend, 'decode', fail)
+    monkeypatch.setattr(requests.Response, 'json', fail)
+
+
+def test_passthrough_returns_body_without_decoding(fake_session,
+                                                   no_decoding):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    cache=MemoryCache(), passthrough=True)
+
+    for _ in range(2):
+        response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+        assert isinstance(response, RawResponse)
+        assert response.status_code == 200
+        assert isinstance(response.body, memoryview)
+        assert response.body.readonly
+        assert json.loads(bytes(response.body).decode('utf-8'))[
+            'temp']['value'] == 1.5
+
+    assert len(adapter.calls) == 1
+
+
+def test_passthrough_decodes_on_demand(fake_session):
+    session, _ = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    passthrough=True)
+
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.data().measurements['temp'].value == 1.5
+    assert response.to_columns().values['temp'][0] == 1.5
+
+
+def test_forward_headers_describe_the_decoded_body(stub_server):
+    with ClimacellApiClient(key='KEY', passthrough=True) as api_client:
+        api_client.BASE_URL = stub_server
+        response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    headers = response.forward_headers()
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in headers
+    assert headers['Content-Type'] == 'application/json'
+    assert headers['Content-Length'] == str(len(response.body))
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from climacell_api.cache import MemoryCache
+from climacell_api.client import ClimacellApiClient
+from climacell_api.ratelimit import (FileBucketStore, MemoryBucketStore,
+                                     RateLimiter)
+
+LIMITS = [('second', 2.0, 1), ('hour', 3.0, 3600)]
+
+
+def test_bucket_refills_over_time():
+    store = MemoryBucketStore()
+
+    assert store.try_consume(LIMITS, now=100) == 0
+    assert store.try_consume(LIMITS, now=100) == 0
+    assert store.try_consume(LIMITS, now=100) == 0.5
+    assert store.try_consume(LIMITS, now=100.5) == 0
+    # The hourly bucket is now empty and refills one token every 20 minutes
+    assert store.try_consume(LIMITS, now=200) > 1000
+
+
+def test_file_store_shares_quota(tmp_path):
+    path = str(tmp_path / 'quota.json')
+    first, second = FileBucketStore(path), FileBucketStore(path)
+
+    assert first.try_consume(LIMITS, now=100) == 0
+    assert second.try_consume(LIMITS, now=100) == 0
+    assert first.try_consume(LIMITS, now=100) > 0
+
+
+def test_higher_priority_goes_first():
+    limiter = RateLimiter(per_second=5)
+    for _ in range(5):
+        limiter.acquire()
+    order = []
+
+    def acquire(name, priority):
+        limiter.acquire(priority)
+        order.append(name)
+
+    low = threading.Thread(target=acquire, args=('historical', 2))
+    high = threading.Thread(target=acquire, args=('realtime', 0))
+    low.start()
+    time.sleep(0.05)
+    high.start()
+    low.join(2)
+    high.join(2)
+
+    assert order == ['realtime', 'historical']
+
+
+def test_acquire_times_out():
+    limiter = RateLimiter(per_hour=1)
+
+    assert limiter.acquire() is True
+    assert limiter.acquire(timeout=0.05) is False
+
+
+def test_cached_responses_do_not_use_tokens(fake_session):
+    session, adapter = fake_session()
+    limiter = RateLimiter(per_hour=1)
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    cache=MemoryCache(), rate_limiter=limiter)
+
+    for _ in range(3):
+        api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert len(adapter.calls) == 1
+    assert limiter.acquire(timeout=0) is False
@@ -0,0 +1,133 @@
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from climacell_api.client import ClimacellApiClient
+from climacell_api.retry import (CircuitBreaker, CircuitOpenError,
+                                 RetryPolicy, retry_after)
+from conftest import realtime_body
+
+UNAVAILABLE = (503, {'statusCode': 503, 'errorCode': 'ServiceUnavailable',
+                     'message': 'try again'})
+
+
+def flaky(failures, failure=UNAVAILABLE):
+    calls = []
+
+    def handler(path, params):
+        calls.append(params)
+        if len(calls) <= failures:
+            if isinstance(failure, Exception):
+                raise failure
+            return failure
+        return realtime_body(path, params)
+
+    return handler
+
+
+def test_retries_until_success(fake_session):
+    session, adapter = fake_session(flaky(2))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session,
+            retry=RetryPolicy(max_attempts=3, backoff_factor=0.001))
+
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.status_code == 200
+    assert len(adapter.calls) == 3
+
+
+def test_gives_up_after_max_attempts(fake_session):
+    session, adapter = fake_session(flaky(5))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session,
+            retry=RetryPolicy(max_attempts=2, backoff_factor=0.001))
+
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.status_code == 503
+    assert len(adapter.calls) == 2
+
+
+def test_connection_errors_are_retried(fake_session):
+    error = requests.exceptions.ConnectionError('connection reset')
+    session, adapter = fake_session(flaky(3, failure=error))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session,
+            retry={'/weather/realtime': RetryPolicy(
+                max_attempts=3, backoff_factor=0.001)})
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        api_client.realtime(lat=12, lon=13, fields=['temp'])
+    assert len(adapter.calls) == 3
+
+
+def test_deadline_stops_retries(fake_session):
+    limited = UNAVAILABLE + ({'Retry-After': '10'},)
+    session, adapter = fake_session(flaky(1, failure=limited))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session,
+            retry=RetryPolicy(max_attempts=5, deadline=5))
+
+    started = time.monotonic()
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.status_code == 503
+    assert len(adapter.calls) == 1
+    assert time.monotonic() - started < 1
+
+
+def test_long_retry_after_is_not_waited_for():
+    policy = RetryPolicy(max_backoff=30)
+    response = requests.Response()
+    response.status_code = 429
+
+    response.headers['Retry-After'] = '3600'
+    assert policy.next_delay(1, 0, response) is None
+    response.headers['Retry-After'] = '20'
+    assert policy.next_delay(1, 0, response) == 20
+    assert RetryPolicy(max_retry_after=3600).next_delay(
+            1, 0, response) == 20
+
+
+def test_retry_after():
+    def response(value):
+        r = requests.Response()
+        r.headers['Retry-After'] = value
+        return r
+
+    assert retry_after(response('3')) == 3
+    assert 8 < retry_after(response(formatdate(time.time() + 10))) <= 10
+    assert retry_after(response('soon')) is None
+    assert retry_after(requests.Response()) is None
+
+
+def test_circuit_breaker_fails_fast(fake_session):
+    session, adapter = fake_session(flaky(2))
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    circuit_breaker=breaker)
+
+    for _ in range(2):
+        api_client.realtime(lat=12, lon=13, fields=['temp'])
+    with pytest.raises(CircuitOpenError):
+        api_client.realtime(lat=12, lon=13, fields=['temp'])
+    assert len(adapter.calls) == 2
+
+    time.sleep(0.06)
+    assert breaker.state == 'half-open'
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+    assert response.status_code == 200
+    assert breaker.state == 'closed'
+
+
+def test_timeouts_are_passed_to_the_session(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    timeout=(2, 10))
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert adapter.send_kwargs[0]['timeout'] == (2, 10)
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from climacell_api.client import ClimacellApiClient, to_datetime
+from climacell_api.rolling import RollingForecast
+
+NOW = datetime(2020, 6, 22, 20, tzinfo=timezone.utc)
+
+
+def forecast_body(path, params):
+    start = to_datetime(params['start_time'])
+    end = to_datetime(params['end_time'])
+    step = timedelta(minutes=int(params.get('timestep', 60)))
+    body = []
+    while start <= end:
+        body.append({
+            'observation_time': {
+                'value': start.strftime('%Y-%m-%dT%H:%M:%S.000Z')},
+            'temp': {'value': 20, 'units': 'C'}})
+        start += step
+    return 200, body
+
+
+def test_only_new_tail_is_fetched(fake_session):
+    session, adapter = fake_session(forecast_body)
+    rolling = RollingForecast(ClimacellApiClient(key='KEY', session=session),
+                              fields=['temp'], max_age=None)
+
+    first = rolling.get(40, 80, now=NOW).data()
+    later = rolling.get(40, 80, now=NOW + timedelta(hours=2)).data()
+
+    assert len(first) == 97
+    assert len(later) == 97
+    assert later[0].observation_time == NOW + timedelta(hours=2)
+    assert later[-1].observation_time == NOW + timedelta(hours=98)
+    assert adapter.calls[1][1]['start_time'] == (
+            NOW + timedelta(hours=96)).isoformat()
+    assert rolling.stats == {'full': 1, 'incremental': 1, 'unchanged': 0}
+
+
+def test_unchanged_window_skips_request(fake_session):
+    session, adapter = fake_session(forecast_body)
+    rolling = RollingForecast(ClimacellApiClient(key='KEY', session=session),
+                              fields=['temp'], endpoint='nowcast', timestep=5,
+                              horizon=timedelta(hours=6))
+
+    rolling.get(40, 80, now=NOW)
+    data = rolling.get(40, 80, now=NOW + timedelta(minutes=2)).data()
+
+    assert len(adapter.calls) == 1
+    assert data[0].observation_time == NOW
+    assert rolling.stats['unchanged'] == 1
+
+
+def test_full_refresh_after_max_age(fake_session):
+    session, adapter = fake_session(forecast_body)
+    rolling = RollingForecast(ClimacellApiClient(key='KEY', session=session),
+                              fields=['temp'], max_age=timedelta(hours=1))
+
+    rolling.get(40, 80, now=NOW)
+    rolling.get(40, 80, now=NOW + timedelta(hours=2))
+
+    assert rolling.stats == {'full': 2, 'incremental': 0, 'unchanged': 0}
+
+
+def test_nowcast_requires_timestep():
+    with pytest.raises(ValueError):
+        RollingForecast(ClimacellApiClient(key='KEY'), fields=['temp'],
+                        endpoint='nowcast')
+
+
+def test_series_is_returned_without_encoding(fake_session):
+    session, _ = fake_session(forecast_body)
+    rolling = RollingForecast(ClimacellApiClient(key='KEY', session=session),
+                              fields=['temp'], max_age=None)
+    rolling.get(40, 80, now=NOW)
+
+    response = rolling.get(40, 80, now=NOW + timedelta(hours=2))
+
+    assert len(response.data()) == 97
+    assert response.request_response._content is False
+    assert json.loads(response.content.decode('utf-8')) == response.json()
+    assert len(list(response.iter_data(chunk_size=64))) == 97
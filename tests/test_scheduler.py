@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+from climacell_api.cache import MemoryCache
+from climacell_api.client import ClimacellApiClient
+from climacell_api.scheduler import PrefetchScheduler
+
+
+def client(session, **kwargs):
+    return ClimacellApiClient(key='KEY', session=session, cache=MemoryCache(),
+                              **kwargs)
+
+
+def test_needs_a_cache(fake_session):
+    session, _ = fake_session()
+
+    with pytest.raises(ValueError):
+        PrefetchScheduler(ClimacellApiClient(key='KEY', session=session))
+
+
+def test_overlapping_subscriptions_share_one_request(fake_session):
+    session, adapter = fake_session()
+    api_client = client(session, merge_fields=True)
+    scheduler = PrefetchScheduler(api_client)
+
+    scheduler.subscribe(12, 13, 'realtime', ['temp'])
+    scheduler.subscribe(12, 13, 'realtime', ['wind_gust'], interval=30)
+    scheduler.subscribe(14, 13, 'realtime', ['temp'])
+
+    assert len(scheduler) == 2
+    assert scheduler.run_pending() == 2
+    assert sorted(params['fields'] for _, params in adapter.calls) == [
+            'temp', 'temp,wind_gust']
+
+    api_client.realtime(lat=12, lon=13, fields=['wind_gust'])
+    api_client.realtime(lat=14, lon=13, fields=['temp'])
+    assert len(adapter.calls) == 2
+
+
+def test_refreshes_keep_the_fields_of_wider_entries(fake_session):
+    session, adapter = fake_session()
+    api_client = client(session, merge_fields=True)
+    scheduler = PrefetchScheduler(api_client)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp', 'humidity'])
+    scheduler.subscribe(12, 13, 'realtime', ['temp'])
+    scheduler.run_pending()
+    api_client.realtime(lat=12, lon=13, fields=['humidity'])
+
+    assert [params['fields'] for _, params in adapter.calls] == [
+            'humidity,temp', 'humidity,temp']
+
+
+def test_snapped_locations_share_one_job(fake_session):
+    session, adapter = fake_session()
+    api_client = client(session, snap_resolution=0.1)
+    scheduler = PrefetchScheduler(api_client)
+
+    scheduler.subscribe(12.01, 13, 'realtime', ['temp'])
+    scheduler.subscribe(12.02, 13.0, 'realtime', ['temp'])
+    scheduler.subscribe(12, 13, 'realtime', ['temp'])
+
+    assert len(scheduler) == 1
+    assert scheduler.run_pending() == 1
+    api_client.realtime(lat=11.99, lon=13, fields=['temp'])
+    assert len(adapter.calls) == 1
+
+
+def test_without_merged_fields_subscriptions_are_kept_apart(fake_session):
+    session, _ = fake_session()
+    scheduler = PrefetchScheduler(client(session))
+
+    scheduler.subscribe(12, 13, 'realtime', ['temp', 'wind_gust'])
+    scheduler.subscribe(12, 13, 'realtime', ['wind_gust', 'temp'])
+    scheduler.subscribe(12, 13, 'realtime', ['temp'])
+
+    assert len(scheduler) == 2
+
+
+def test_refreshes_are_spread_and_bypass_the_cache(fake_session):
+    session, adapter = fake_session()
+    api_client = client(session)
+    scheduler = PrefetchScheduler(api_client, lead=5, max_workers=1)
+    for lat in range(10):
+        scheduler.subscribe(lat, 13, 'realtime', ['temp'])
+    start = time.time()
+    scheduler.run_pending(start)
+    assert len(adapter.calls) == 10
+
+    # realtime responses stay fresh 60s, so each is refreshed every 55s,
+    # in its own slot of the period
+    per_window = []
+    for window in range(11):
+        before = len(adapter.calls)
+        scheduler.run_pending(start + (window + 1) * 5)
+        per_window.append(len(adapter.calls) - before)
+    assert sum(per_window) == 10
+    assert max(per_window) <= 2
+
+    api_client.realtime(lat=3, lon=13, fields=['temp'])
+    assert len(adapter.calls) == 20
+
+
+def test_unsubscribe(fake_session):
+    session, _ = fake_session()
+    scheduler = PrefetchScheduler(client(session))
+    first = scheduler.subscribe(12, 13, 'realtime', ['temp'])
+    second = scheduler.subscribe(12, 13, 'realtime', ['temp'])
+
+    scheduler.unsubscribe(first)
+    assert len(scheduler) == 1
+    scheduler.unsubscribe(second)
+    assert len(scheduler) == 0
+    assert scheduler.run_pending() == 0
+
+
+def test_background_thread_warms_the_cache(fake_session):
+    session, adapter = fake_session()
+    scheduler = PrefetchScheduler(client(session))
+    scheduler.subscribe(12, 13, 'forecast_hourly', ['temp'])
+
+    scheduler.start()
+    try:
+        deadline = time.time() + 5
+        while not adapter.calls and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+
+    assert len(adapter.calls) == 1
+    assert scheduler.stats == {'refreshes': 1, 'errors': 0}
@@ -0,0 +1,78 @@
+import random
+import time
+
+import pytest
+
+from climacell_api.client import ClimacellApiClient
+from climacell_api.spatial import SpatialIndex, distance
+
+
+def test_distance():
+    # One degree of latitude is about 111km anywhere
+    assert distance(10, 20, 11, 20) == pytest.approx(111.2, abs=0.1)
+    assert distance(0, 179.9, 0, -179.9) == pytest.approx(22.2, abs=0.1)
+
+
+def test_nearest_matches_brute_force():
+    index = SpatialIndex(max_distance=50, cell_size=0.25)
+    generator = random.Random(4)
+    points = [(generator.uniform(40, 42), generator.uniform(-90, -88))
+              for _ in range(2000)]
+    for i, (lat, lon) in enumerate(points):
+        index.add(lat, lon, i)
+
+    for _ in range(50):
+        lat, lon = generator.uniform(40, 42), generator.uniform(-90, -88)
+        expected = min(range(len(points)),
+                       key=lambda i: distance(lat, lon, *points[i]))
+        assert index.nearest(lat, lon)[0] == expected
+
+
+def test_nearest_respects_distance_age_and_match():
+    index = SpatialIndex(max_distance=5, max_age=60)
+    now = time.time()
+    index.add(40.0, -89.0, 'old', stored_at=now - 61)
+    index.add(40.01, -89.0, 'us', tag='us', stored_at=now)
+    index.add(40.02, -89.0, 'si', tag='si', stored_at=now)
+
+    item, km = index.nearest(40.0, -89.0, match=lambda tag: tag == 'si')
+    assert (item, round(km, 1)) == ('si', 2.2)
+    assert index.nearest(40.0, -89.0)[0] == 'us'
+    assert index.nearest(41.0, -89.0) is None
+    assert len(index) == 2
+
+    assert index.nearest(40.0, -89.0, now=now + 30, max_age=20) is None
+    assert index.nearest(40.0, -89.0, now=now + 30, max_age=90)[0] == 'us'
+
+    assert index.prune(now=now + 61) == 2
+    assert len(index) == 0
+
+
+def test_realtime_uses_nearest_cached_location(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session,
+                                    spatial_index=SpatialIndex(max_distance=2))
+
+    api_client.realtime(lat=40.0, lon=-89.0, fields=['temp', 'wind_gust'])
+    near = api_client.realtime(lat=40.01, lon=-89.0, fields=['temp'])
+    api_client.realtime(lat=40.01, lon=-89.0, fields=['temp'], units='us')
+    api_client.realtime(lat=40.01, lon=-89.0, fields=['humidity'])
+    api_client.realtime(lat=40.1, lon=-89.0, fields=['temp'])
+
+    assert len(adapter.calls) == 4
+    assert near.data().lat == 40.0
+    assert list(near.data().measurements) == ['temp']
+
+
+def test_nearest_locations_expire_with_the_cache_ttl(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, spatial_index=SpatialIndex(),
+            cache_ttls={'/weather/realtime': 0.05})
+
+    api_client.realtime(lat=40.0, lon=-89.0, fields=['temp'])
+    api_client.realtime(lat=40.01, lon=-89.0, fields=['temp'])
+    time.sleep(0.06)
+    api_client.realtime(lat=40.01, lon=-89.0, fields=['temp'])
+
+    assert len(adapter.calls) == 2
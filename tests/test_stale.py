@@ -0,0 +1,149 @@
+import logging
+import time
+
+import pytest
+import requests
+
+from climacell_api.cache import CacheEntry, MemoryCache
+from climacell_api.client import ClimacellApiClient
+from climacell_api.metrics import HistogramCollector
+
+from conftest import realtime_body
+
+TTLS = {'/weather/realtime': 0.05}
+
+
+def failing_after(count, failure):
+    calls = []
+
+    def handler(path, params):
+        calls.append(path)
+        if len(calls) > count:
+            if isinstance(failure, Exception):
+                raise failure
+            return failure, {'message': 'unavailable'}
+        return realtime_body(path, params)
+
+    return handler
+
+
+def test_memory_cache_keeps_entries_for_max_stale():
+    cache = MemoryCache()
+    cache.set('a', CacheEntry('a', time.time() - 10, 5))
+
+    assert cache.get('a', max_stale=60).response == 'a'
+    assert cache.get('a') is None
+    assert cache.get('a', max_stale=60) is None
+
+
+def test_stale_while_revalidate_serves_expired_and_refreshes(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(), cache_ttls=TTLS,
+            stale_while_revalidate=60)
+
+    first = api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    stale = api_client.realtime(lat=12, lon=13, fields=['temp'])
+    api_client.close()
+    fresh = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert not first.stale and first.age is None
+    assert stale.stale and stale.age >= 0.05
+    assert stale.json() == first.json()
+    assert not fresh.stale
+    assert len(adapter.calls) == 2
+
+
+def test_stale_while_revalidate_window_is_bounded(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(), cache_ttls=TTLS,
+            stale_while_revalidate=0.01)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.07)
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert not response.stale
+    assert len(adapter.calls) == 2
+
+
+@pytest.mark.parametrize('failure', [
+    503, 429, requests.exceptions.ConnectionError('connection reset')])
+def test_stale_if_error_serves_expired_on_failure(fake_session, failure):
+    session, adapter = fake_session(failing_after(1, failure))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(), cache_ttls=TTLS,
+            stale_if_error=60)
+
+    first = api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.status_code == 200
+    assert response.stale
+    assert response.json() == first.json()
+    assert len(adapter.calls) == 2
+
+
+def test_errors_pass_through_without_stale_if_error(fake_session):
+    session, _ = fake_session(failing_after(1, 503))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(), cache_ttls=TTLS)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.status_code == 503
+    assert not response.stale
+
+
+def test_client_errors_are_not_masked(fake_session):
+    session, _ = fake_session(failing_after(1, 400))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(), cache_ttls=TTLS,
+            stale_if_error=60)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.status_code == 400
+
+
+def test_stale_responses_are_reported(fake_session):
+    session, _ = fake_session()
+    collector = HistogramCollector()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(), cache_ttls=TTLS,
+            stale_while_revalidate=60, instruments=[collector])
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    api_client.close()
+
+    assert collector.snapshot()['/weather/realtime']['cache.stale'] == 1
+
+
+@pytest.mark.parametrize('failure', [
+    503, requests.exceptions.ConnectionError('connection reset')])
+def test_failed_revalidations_are_logged(fake_session, caplog, failure):
+    session, _ = fake_session(failing_after(1, failure))
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, cache=MemoryCache(), cache_ttls=TTLS,
+            stale_while_revalidate=60)
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    with caplog.at_level(logging.WARNING, logger='climacell_api.client'):
+        response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+        api_client.close()
+
+    assert response.stale
+    assert len(caplog.records) == 1
+    assert 'Revalidating /weather/realtime for 12, 13 failed' in (
+        caplog.records[0].getMessage())
+    assert 'KEY' not in caplog.text
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+import requests
+
+from climacell_api.cache import DEFAULT_TTLS, MemoryCache
+from climacell_api.client import ClimacellApiClient
+from climacell_api.store import ResponseStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResponseStore(str(tmp_path / 'responses.db'))
+    yield store
+    store.close()
+
+
+def test_restarted_client_serves_from_store(fake_session, store):
+    session, adapter = fake_session()
+    ClimacellApiClient(key='KEY', session=session, store=store).realtime(
+            lat=12, lon=13, fields=['temp'])
+
+    restarted = ClimacellApiClient(key='KEY', session=session,
+                                   cache=MemoryCache(), store=store)
+    response = restarted.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert len(adapter.calls) == 1
+    assert response.data().measurements['temp'].value == 1.5
+    assert 'apikey' not in response.url
+    assert len(restarted.cache) == 1
+
+
+def test_stale_stored_responses_are_refetched(fake_session, store):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(
+            key='KEY', session=session, store=store,
+            cache_ttls={'/weather/realtime': 0.05})
+
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+    time.sleep(0.06)
+    api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert len(adapter.calls) == 2
+    assert len(store) == 1
+
+
+def test_offline_replays_any_age(fake_session, store):
+    session, _ = fake_session()
+    ClimacellApiClient(key='KEY', session=session, store=store).realtime(
+            lat=12, lon=13, fields=['temp'])
+
+    offline = ClimacellApiClient(key='KEY', store=store, offline=True,
+                                 cache_ttls={'/weather/realtime': 0.001})
+    time.sleep(0.01)
+
+    assert offline.realtime(lat=12, lon=13, fields=['temp']).ok
+    with pytest.raises(requests.exceptions.ConnectionError):
+        offline.realtime(lat=14, lon=13, fields=['temp'])
+
+
+def test_warm_loads_fresh_responses(fake_session, store):
+    session, _ = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session, store=store)
+    for lat in range(3):
+        api_client.realtime(lat=lat, lon=13, fields=['temp'])
+
+    cache = MemoryCache()
+    assert store.warm(cache, DEFAULT_TTLS) == 3
+    assert store.warm(MemoryCache(), DEFAULT_TTLS,
+                      now=time.time() + 3600) == 0
+    assert store.prune(older_than=0) == 3
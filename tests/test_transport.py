@@ -0,0 +1,47 @@
+from climacell_api.client import ClimacellApiClient
+
+
+def test_injected_session_is_used(fake_session):
+    session, adapter = fake_session()
+    api_client = ClimacellApiClient(key='KEY', session=session)
+    response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+
+    assert response.status_code == 200
+    assert response.data().measurements['temp'].value == 1.5
+    assert adapter.calls == [('/v3/weather/realtime', {
+        'lat': '12', 'lon': '13', 'unit_system': 'si', 'fields': 'temp',
+        'apikey': 'KEY'})]
+
+
+def test_pool_reuses_connections(stub_server):
+    with ClimacellApiClient(key='KEY', pool_maxsize=2) as api_client:
+        api_client.BASE_URL = stub_server
+        for _ in range(3):
+            response = api_client.realtime(lat=12, lon=13, fields=['temp'])
+            assert response.status_code == 200
+
+        assert api_client.pool_stats() == {
+                'requests': 3, 'hits': 2, 'misses': 1}
+
+
+def test_no_keep_alive_sends_connection_close():
+    api_client = ClimacellApiClient(key='KEY', keep_alive=False)
+
+    assert api_client.session.headers['Connection'] == 'close'
+
+
+def test_compressed_responses_are_negotiated_and_counted(stub_server):
+    fields = ['temp', 'feels_like', 'humidity', 'wind_speed', 'wind_gust',
+              'precipitation', 'cloud_cover', 'dewpoint']
+    with ClimacellApiClient(key='KEY') as api_client:
+        api_client.BASE_URL = stub_server
+        for _ in range(2):
+            response = api_client.realtime(lat=12, lon=13, fields=fields)
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert response.data().measurements['dewpoint'].value == 1.5
+
+        assert 'gzip' in response.request.headers['Accept-Encoding']
+        stats = api_client.transfer_stats()['/weather/realtime']
+        assert stats['responses'] == 2
+        assert stats['body_bytes'] == 2 * len(response.content)
+        assert 0 < stats['wire_bytes'] < stats['body_bytes']